@@ -1,6 +1,12 @@
-from openai import OpenAI
+import json
 
-from agents.utils.utils import build_messages, load_categories_from_yaml
+import openai
+
+from agents.classification.json_formats import create_batch_classification_format, create_joint_classification_format
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.response_cache import cached_chat_completion
+from agents.utils.utils import build_messages
+from prompt.prompt_registry import PromptRegistry
 from utils.configuration import Config
 from utils.decorators import retry_with_exponential_backoff
 from utils.token_usage_counter import TokenUsageCounter
@@ -21,44 +27,216 @@ class ClassificationAgent:
         summary_type (str): 요약 유형을 나타내는 문자열입니다.
     """
 
+    # n 파라미터(한 요청에서 여러 샘플) 지원 여부, 지원하지 않는 것이 확인되면 False로 바뀐다
+    supports_n: bool = True
+
     def __init__(self, model_name: str, temperature=None, seed=None):
         self.model_name = model_name
         self.temperature = temperature
         self.seed = seed
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
+        self.client = UpstageClientRegistry.get_client()
 
-    @retry_with_exponential_backoff()
     def process(self, summary: str, classification_type: str) -> str:
         """
         주어진 메일(또는 메일 리스트)을 분류하여 해당 레이블 문자열을 반환합니다.
 
         Args:
-            mail (Mail): 분류할 메일 객체(Mail)입니다.
+            summary (str): 분류할 메일의 요약문입니다.
+            classification_type (str): ClassificationType.CATEGORY 혹은 ClassificationType.ACTION
 
         Returns:
             str: 메일의 분류 결과입니다.
         """
+        return self.sample(summary, classification_type)[0]
 
-        categories = load_categories_from_yaml(classification_type, is_prompt=True)
-        categories_text = ""
-        for category in categories:
-            categories_text += f"카테고리 명: {category['name']}\n분류 기준: {category['rubric']}\n"
+    @retry_with_exponential_backoff()
+    def sample(self, summary: str, classification_type: str, n: int = 1, vote_offset: int = 0) -> list[str]:
+        """
+        같은 메일을 n번 분류한 결과(투표)를 반환합니다.
 
-        response = self.client.chat.completions.create(
+        Args:
+            vote_offset (int): 이미 모은 투표 수. 캐시에서 투표마다 다른 항목을 사용하도록 구분하는 데 쓰입니다.
+        """
+        return self._create_samples(
+            "classification",
+            n,
+            vote_offset,
             model=self.model_name,
             messages=build_messages(
                 template_type="classification",
                 target_range="single",
                 action="classification",
                 mail=summary,
-                categories=categories_text,
+                categories=PromptRegistry.get_categories_text(classification_type),
+            ),
+            temperature=self.temperature,
+            seed=self.seed,
+        )
+
+    def process_joint(self, summary: str, classification_types: list[str]) -> dict[str, str]:
+        """
+        하나의 요청으로 메일을 여러 분류 종류(예: category, action)에 대해 함께 분류합니다.
+        분류 종류 별 카테고리 이름을 enum으로 제한한 JSON 스키마를 사용하므로 항상 허용된 레이블만 반환하며,
+        응답이 올바르지 않은 분류 종류는 process로 다시 분류합니다.
+
+        Args:
+            summary (str): 메일 요약문
+            classification_types (list[str]): 함께 분류할 분류 종류
+
+        Returns:
+            dict[str, str]: 분류 종류 -> 분류 결과
+        """
+        return self.sample_joint(summary, classification_types)[0]
+
+    @retry_with_exponential_backoff()
+    def sample_joint(
+        self, summary: str, classification_types: list[str], n: int = 1, vote_offset: int = 0
+    ) -> list[dict[str, str]]:
+        """process_joint를 n번 수행한 결과(투표)를 반환합니다."""
+        labels_by_type = self._get_labels_by_type(classification_types)
+
+        contents = self._create_samples(
+            "joint_classification",
+            n,
+            vote_offset,
+            model=self.model_name,
+            messages=build_messages(
+                template_type="classification",
+                target_range="joint",
+                action="classification",
+                mail=summary,
+                categories=self._build_categories_text(classification_types),
+            ),
+            response_format=create_joint_classification_format(labels_by_type),
+            max_tokens=Config.config["classification"]["max_output_tokens_per_mail"],
+            temperature=self.temperature,
+            seed=self.seed,
+        )
+        return [
+            self._validate_labels(self._load_json(content), summary, labels_by_type, vote_index)
+            for vote_index, content in enumerate(contents, start=vote_offset)
+        ]
+
+    def process_batch(self, summary_dict: dict[str, str], classification_types: list[str]) -> dict[str, dict[str, str]]:
+        """
+        여러 메일의 요약문을 한 번의 요청으로 분류합니다. classification_types가 여러 개면 함께 분류합니다.
+        응답에서 빠졌거나 허용되지 않은 레이블을 받은 메일은 process로 한 통씩 다시 분류합니다.
+
+        Args:
+            summary_dict (dict[str, str]): 메일 ID -> 요약문
+            classification_types (list[str]): 분류 종류 (예: [ClassificationType.CATEGORY])
+
+        Returns:
+            dict[str, dict[str, str]]: 메일 ID -> {분류 종류 -> 분류 결과} (summary_dict 순서 유지)
+        """
+        return {mail_id: votes[0] for mail_id, votes in self.sample_batch(summary_dict, classification_types).items()}
+
+    @retry_with_exponential_backoff()
+    def sample_batch(
+        self, summary_dict: dict[str, str], classification_types: list[str], n: int = 1, vote_offset: int = 0
+    ) -> dict[str, list[dict[str, str]]]:
+        """process_batch를 n번 수행한 결과를 메일 별 투표 리스트로 반환합니다."""
+        labels_by_type = self._get_labels_by_type(classification_types)
+        # 긴 Gmail message id 대신 1부터 시작하는 번호로 메일을 구분하여 토큰을 줄인다
+        key_to_mail_id = {str(idx): mail_id for idx, mail_id in enumerate(summary_dict, start=1)}
+        mails_text = "\n\n".join(f"[메일 {key}]\n{summary_dict[mail_id]}" for key, mail_id in key_to_mail_id.items())
+
+        contents = self._create_samples(
+            "batch_classification",
+            n,
+            vote_offset,
+            model=self.model_name,
+            messages=build_messages(
+                template_type="classification",
+                target_range="batch",
+                action="classification",
+                mails=mails_text,
+                categories=self._build_categories_text(classification_types),
             ),
+            response_format=create_batch_classification_format(list(key_to_mail_id), labels_by_type),
+            max_tokens=Config.config["classification"]["max_output_tokens_per_mail"] * len(key_to_mail_id),
             temperature=self.temperature,
             seed=self.seed,
         )
 
-        TokenUsageCounter.add_usage(self.__class__.__name__, "classification", response.usage.total_tokens)
+        votes_dict = {mail_id: [] for mail_id in summary_dict}
+        for vote_index, content in enumerate(contents, start=vote_offset):
+            batch_labels = self._load_json(content)
+            for key, mail_id in key_to_mail_id.items():
+                votes_dict[mail_id].append(
+                    self._validate_labels(batch_labels.get(key), summary_dict[mail_id], labels_by_type, vote_index)
+                )
+        return votes_dict
+
+    def _create_samples(self, usage_type: str, n: int, vote_offset: int, **kwargs) -> list[str]:
+        """
+        요청 하나에서 n개의 응답을 받아옵니다.
+        n 파라미터를 지원하지 않는 API(요청 오류 혹은 응답 수 부족)라면 이후로는 한 번에 하나씩 요청합니다.
+        투표마다 다른 캐시 항목을 사용하므로 다시 실행해도 같은 투표 분포가 재현됩니다.
+        """
+        contents = []
+        if n > 1 and ClassificationAgent.supports_n:
+            try:
+                response = cached_chat_completion(
+                    self.client, self.__class__.__name__, usage_type, f"votes:{vote_offset}:{n}", n=n, **kwargs
+                )
+                TokenUsageCounter.add_usage(self.__class__.__name__, usage_type, response.usage.total_tokens)
+                contents = [choice.message.content for choice in response.choices]
+                if len(contents) < n:
+                    ClassificationAgent.supports_n = False
+            except openai.BadRequestError:
+                ClassificationAgent.supports_n = False
+
+        while len(contents) < n:
+            vote_index = vote_offset + len(contents)
+            # 첫 번째 투표는 반복 추론을 하지 않을 때와 같은 캐시 항목을 사용
+            cache_salt = f"vote:{vote_index}" if vote_index else None
+            response = cached_chat_completion(self.client, self.__class__.__name__, usage_type, cache_salt, **kwargs)
+            TokenUsageCounter.add_usage(self.__class__.__name__, usage_type, response.usage.total_tokens)
+            contents.append(response.choices[0].message.content)
+        return contents[:n]
 
-        label: str = response.choices[0].message.content
+    @staticmethod
+    def _get_labels_by_type(classification_types: list[str]) -> dict[str, list[str]]:
+        return {
+            classification_type: [
+                category["name"] for category in PromptRegistry.get_categories(classification_type, is_prompt=True)
+            ]
+            for classification_type in classification_types
+        }
+
+    @staticmethod
+    def _build_categories_text(classification_types: list[str]) -> str:
+        if len(classification_types) == 1:
+            return PromptRegistry.get_categories_text(classification_types[0])
+        return "\n".join(
+            f"[{classification_type}]\n{PromptRegistry.get_categories_text(classification_type)}"
+            for classification_type in classification_types
+        )
+
+    @staticmethod
+    def _load_json(content: str) -> dict:
+        try:
+            content = json.loads(content)
+        except (TypeError, json.JSONDecodeError):
+            return {}
+        return content if isinstance(content, dict) else {}
+
+    def _validate_labels(
+        self, labels, summary: str, labels_by_type: dict[str, list[str]], vote_index: int = 0
+    ) -> dict[str, str]:
+        """
+        허용되지 않은 레이블(혹은 누락된 레이블)을 받은 분류 종류만 개별 분류로 다시 분류합니다.
+        투표마다 다른 캐시 항목을 사용하도록 개별 분류에도 같은 투표 번호(vote_index)를 사용합니다.
+        """
+        if not isinstance(labels, dict):
+            labels = {}
 
-        return label
+        validated = {}
+        for classification_type, allowed_labels in labels_by_type.items():
+            label = labels.get(classification_type)
+            if label not in allowed_labels:
+                print(f"[Classification] {classification_type} 분류 결과({label})가 올바르지 않아 개별 분류합니다.")
+                label = self.sample(summary, classification_type, vote_offset=vote_index)[0]
+            validated[classification_type] = label
+        return validated
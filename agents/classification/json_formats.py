@@ -0,0 +1,64 @@
+def create_label_schema(labels_by_type: dict[str, list[str]]) -> dict:
+    """
+    메일 한 통의 분류 결과 스키마를 생성합니다.
+    strict structured output은 객체 루트만 허용하므로, 분류 종류가 하나여도 분류 종류 별 enum 필드를 가진 객체를 반환합니다.
+
+    Args:
+        labels_by_type (dict[str, list[str]]): 분류 종류 -> 허용되는 카테고리 이름
+    """
+    return {
+        "type": "object",
+        "properties": {
+            classification_type: {"type": "string", "enum": labels}
+            for classification_type, labels in labels_by_type.items()
+        },
+        "required": list(labels_by_type),
+        "additionalProperties": False,
+    }
+
+
+def create_joint_classification_format(labels_by_type: dict[str, list[str]]) -> dict:
+    """
+    메일 한 통을 여러 분류 종류(예: category, action)로 한 번에 분류할 때 사용할 response_format을 생성합니다.
+
+    Returns:
+        dict: chat.completions.create의 response_format 인자
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "joint_classification",
+            "strict": True,
+            "schema": create_label_schema(labels_by_type),
+        },
+    }
+
+
+def create_batch_classification_format(mail_keys: list[str], labels_by_type: dict[str, list[str]]) -> dict:
+    """
+    여러 메일을 한 번에 분류할 때 사용할 response_format을 생성합니다.
+    메일 번호(mail_keys)마다 create_label_schema의 결과만 허용하도록 제한합니다.
+
+    Args:
+        mail_keys (list[str]): 프롬프트에 표시한 메일 번호 (예: ["1", "2", "3"])
+        labels_by_type (dict[str, list[str]]): 분류 종류 -> 허용되는 카테고리 이름
+
+    Returns:
+        dict: chat.completions.create의 response_format 인자
+    """
+    label_schema = create_label_schema(labels_by_type)
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "batch_classification",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    key: {**label_schema, "description": f"메일 {key}의 분류 결과입니다."} for key in mail_keys
+                },
+                "required": mail_keys,
+                "additionalProperties": False,
+            },
+        },
+    }
@@ -0,0 +1,142 @@
+import os
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from agents.embedding.embedding_manager import EmbeddingManager
+
+
+class KnnClassifier:
+    """
+    이미 분류된 메일들의 임베딩 벡터와 레이블을 저장해 두고, 새 메일을 kNN으로 분류하는 클래스입니다.
+    이웃들의 레이블이 충분히 일치할 때만 결과를 반환하므로, 나머지 메일만 LLM(ClassificationAgent)으로 분류하면 됩니다.
+
+    - 저장소는 사용자, 임베딩 모델 별로 store_dir/{user_id}/{model_name}.npz에 저장됩니다.
+      한 사용자의 메일과 LLM 분류 결과가 다른 사용자의 이웃으로 쓰이지 않도록 사용자 간에 공유하지 않습니다.
+    - 저장소가 없으면 seed_path(ground truth csv)의 제목을 임베딩하여 초기화합니다.
+    - LLM으로 분류한 메일은 add()로 저장소에 추가되어 다음 실행부터 이웃으로 사용됩니다.
+
+    Args:
+        embedding_manager (EmbeddingManager): 메일 제목 임베딩에 사용할 매니저
+        classification_types (list[str]): 저장하고 예측할 분류 종류 (예: ["category", "action"])
+        store_dir (str): 저장소 디렉토리
+        user_id (str): 저장소를 구분할 사용자 ID
+        seed_path (str, optional): mail_id, subject 및 분류 종류 칼럼을 가진 csv
+        k (int): 참고할 이웃 수
+        agreement_threshold (float): 이웃 중 같은 레이블의 (유사도 가중) 비율이 이 값 이상이어야 결과를 반환
+        min_similarity (float): 이보다 유사도가 낮은 이웃은 사용하지 않음
+        max_size (int): 저장소의 최대 메일 수, 초과 시 오래된 메일부터 삭제
+    """
+
+    def __init__(
+        self,
+        embedding_manager: EmbeddingManager,
+        classification_types: list[str],
+        store_dir: str,
+        user_id: str,
+        seed_path: Optional[str] = None,
+        k: int = 5,
+        agreement_threshold: float = 0.8,
+        min_similarity: float = 0.7,
+        max_size: int = 5000,
+    ):
+        self.embedding_manager = embedding_manager
+        self.classification_types = classification_types
+        self.store_path = os.path.join(store_dir, user_id, f"{embedding_manager.model_name}.npz")
+        self.seed_path = seed_path
+        self.k = k
+        self.agreement_threshold = agreement_threshold
+        self.min_similarity = min_similarity
+        self.max_size = max_size
+
+        self.mail_ids: list[str] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.labels: dict[str, list[str]] = {classification_type: [] for classification_type in classification_types}
+        self._load()
+
+    def predict(self, vector: np.ndarray, mail_id: Optional[str] = None) -> Optional[dict[str, str]]:
+        """
+        Args:
+            vector (np.ndarray): 분류할 메일의 임베딩 벡터
+            mail_id (str, optional): 분류할 메일의 ID, 저장소에 같은 메일이 있으면 이웃에서 제외
+                (ground truth로 초기화한 저장소가 평가 대상 메일의 정답을 그대로 돌려주지 않도록)
+
+        Returns:
+            Optional[dict[str, str]]: 분류 종류 -> 레이블, 이웃이 부족하거나 일치도가 낮으면 None
+        """
+        is_stored = mail_id is not None and mail_id in self.mail_ids
+        if self.vectors is None or len(self.mail_ids) - is_stored < self.k:
+            return None
+
+        similarities = self._normalize(self.vectors) @ self._normalize(vector[np.newaxis, :])[0]
+        if is_stored:
+            similarities[self.mail_ids.index(mail_id)] = -np.inf
+        neighbors = [idx for idx in np.argsort(-similarities)[: self.k] if similarities[idx] >= self.min_similarity]
+        if len(neighbors) < self.k:
+            return None
+
+        total_weight = float(sum(similarities[idx] for idx in neighbors))
+        prediction = {}
+        for classification_type in self.classification_types:
+            weights = Counter()
+            for idx in neighbors:
+                weights[self.labels[classification_type][idx]] += float(similarities[idx])
+            label, weight = weights.most_common(1)[0]
+            if weight / total_weight < self.agreement_threshold:
+                return None
+            prediction[classification_type] = label
+        return prediction
+
+    def add(self, mail_id: str, vector: np.ndarray, labels: dict[str, str]) -> None:
+        """분류된 메일을 저장소에 추가합니다. 같은 메일 ID가 있으면 교체합니다."""
+        if mail_id in self.mail_ids:
+            self._remove(self.mail_ids.index(mail_id))
+
+        self.mail_ids.append(mail_id)
+        self.vectors = vector[np.newaxis, :] if self.vectors is None else np.vstack([self.vectors, vector])
+        for classification_type in self.classification_types:
+            self.labels[classification_type].append(labels[classification_type])
+
+        while len(self.mail_ids) > self.max_size:
+            self._remove(0)
+
+    def save(self) -> None:
+        if self.vectors is None:
+            return
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        np.savez(
+            self.store_path,
+            mail_ids=np.array(self.mail_ids),
+            vectors=self.vectors,
+            **{f"labels_{key}": np.array(values) for key, values in self.labels.items()},
+        )
+
+    def _load(self) -> None:
+        if os.path.exists(self.store_path):
+            store = np.load(self.store_path)
+            self.mail_ids = store["mail_ids"].tolist()
+            self.vectors = store["vectors"]
+            self.labels = {key: store[f"labels_{key}"].tolist() for key in self.classification_types}
+        elif self.seed_path and os.path.exists(self.seed_path):
+            self._seed()
+
+    def _seed(self) -> None:
+        """ground truth csv의 제목을 임베딩하여 저장소를 초기화합니다."""
+        seed_df = pd.read_csv(self.seed_path, encoding="utf-8-sig")
+        vectors = self.embedding_manager.embed_texts(dict(zip(seed_df["mail_id"], seed_df["subject"])))
+        for _, row in seed_df.iterrows():
+            self.add(row["mail_id"], vectors[row["mail_id"]], {key: row[key] for key in self.classification_types})
+        self.save()
+        print(f"kNN 분류 저장소를 {self.seed_path}의 메일 {len(seed_df)}개로 초기화했습니다.")
+
+    def _remove(self, idx: int) -> None:
+        del self.mail_ids[idx]
+        self.vectors = np.delete(self.vectors, idx, axis=0)
+        for values in self.labels.values():
+            del values[idx]
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10)
@@ -1,4 +1,4 @@
-from typing import Callable, TypedDict
+from typing import Callable, Optional, TypedDict
 
 import numpy as np
 
@@ -83,15 +83,42 @@ class EmbeddingManager:
 
         self.threshold = similarity_threshold
         self.is_save_results = is_save_results
-
-    def run(self, grouped_dict: dict[str, dict[str, Mail]]) -> dict[str, list[str]]:
-
+        # 같은 텍스트를 다시 임베딩하지 않도록 텍스트 -> 벡터를 보관
+        self._vector_cache: dict[str, np.ndarray] = {}
+
+    def embed_texts(self, text_dict: dict[str, str]) -> dict[str, np.ndarray]:
+        """ID -> 텍스트를 ID -> 임베딩 벡터로 변환합니다. 이미 임베딩한 텍스트는 다시 계산하지 않습니다."""
+        embedding_vectors = {}
+        for key, text in text_dict.items():
+            if text not in self._vector_cache:
+                self._vector_cache[text] = self.embedding_model.process(text)
+            embedding_vectors[key] = self._vector_cache[text]
+        return embedding_vectors
+
+    def embed(self, mail_dict: dict[str, Mail]) -> dict[str, np.ndarray]:
+        """메일 제목의 임베딩 벡터를 계산합니다. 분류(kNN)와 클러스터링에서 같은 벡터를 재사용합니다."""
+        return self.embed_texts({mail_id: mail.subject for mail_id, mail in mail_dict.items()})
+
+    def run(
+        self,
+        grouped_dict: dict[str, dict[str, Mail]],
+        embedding_vectors: Optional[dict[str, np.ndarray]] = None,
+    ) -> dict[str, list[str]]:
+        """
+        Args:
+            grouped_dict: 카테고리 -> 메일 ID -> Mail
+            embedding_vectors (optional): embed()로 미리 계산한 메일 ID -> 벡터, 없는 메일만 새로 계산
+        """
         clustered_dict: dict[str, dict[str, list[str]]] = {}
         for category, grouped_mail_dict in grouped_dict.items():
-            embedding_vectors = {
-                mail_id: self.embedding_model.process(mail.subject) for mail_id, mail in grouped_mail_dict.items()
+            precomputed = embedding_vectors or {}
+            missing = {mail_id: mail for mail_id, mail in grouped_mail_dict.items() if mail_id not in precomputed}
+            computed = self.embed(missing)
+            group_vectors = {
+                mail_id: precomputed[mail_id] if mail_id in precomputed else computed[mail_id]
+                for mail_id in grouped_mail_dict
             }
-            similar_dict = self.compute_similarity(embedding_vectors)
+            similar_dict = self.compute_similarity(group_vectors)
 
             if self.is_save_results:
                 self._save_top_match(category, grouped_mail_dict, similar_dict)
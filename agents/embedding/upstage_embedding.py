@@ -1,13 +1,12 @@
 import numpy as np
-from openai import OpenAI
 
 from agents.embedding.sentence_splitter import split_sentences
-from utils.configuration import Config
+from agents.utils.client_registry import UpstageClientRegistry
 
 
 class UpstageEmbeddingAgent:
     def __init__(self):
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
+        self.client = UpstageClientRegistry.get_client()
 
     def process(self, summary: str) -> np.ndarray:
         splitted_sentences = split_sentences(summary)
@@ -1,19 +1,47 @@
+import json
 import re
 
-from openai import OpenAI
+import openai
 
+from agents.reflexion.json_formats import create_geval_format
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.response_cache import cached_chat_completion
+from prompt.prompt_registry import PromptRegistry
 from utils.configuration import Config
 from utils.decorators import retry_with_exponential_backoff
 from utils.token_usage_counter import TokenUsageCounter
 
+# 평가 항목 -> (최저 점수, 최고 점수), g_eval 프롬프트의 채점 기준과 같아야 한다
+ASPECT_SCORE_RANGES = {
+    "consistency": (1, 5),
+    "coherence": (1, 5),
+    "fluency": (1, 3),
+    "relevance": (1, 5),
+}
+
 
 class ReflexionEvaluator:
+    """
+    Reflexion에서 생성한 리포트를 G-Eval로 채점합니다.
+
+    - multi_aspect 모드: 모든 항목을 JSON Schema로 제한된 하나의 요청으로 채점합니다.
+      응답에서 얻지 못한 항목만 per_aspect 방식으로 다시 채점합니다.
+    - per_aspect 모드: 항목마다 따로 요청합니다. (원문을 항목 수만큼 반복해서 보냄)
+
+    토큰 사용량은 모드 별로 "evaluator_multi_aspect", "evaluator_per_aspect"에 기록됩니다.
+    """
+
     def __init__(self):
         self.model_name = "solar-pro"
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
+        self.client = UpstageClientRegistry.get_client()
 
         self.prompt_path: str = Config.config["report"]["g_eval"]["prompt_path"]
-        self.aspects = ["consistency", "coherence", "fluency", "relevance"]
+        self.mode: str = Config.config["reflexion"]["g_eval_mode"]
+        if self.mode not in ("multi_aspect", "per_aspect"):
+            raise ValueError(
+                f'g_eval_mode: {self.mode}는 허용되지 않는 값입니다. "multi_aspect" 혹은 "per_aspect"로 설정해주세요.'
+            )
+        self.aspects = list(ASPECT_SCORE_RANGES)
 
     @retry_with_exponential_backoff()
     def get_geval_scores(self, source_text: str, output_text: str) -> dict:
@@ -26,15 +54,62 @@ class ReflexionEvaluator:
         Returns:
             g_eval_result (dict): g-eval 결과 딕셔너리
         """
+        aspect_scores = {}
+        if self.mode == "multi_aspect":
+            aspect_scores = self._get_multi_aspect_scores(source_text, output_text)
+
+        missing_aspects = [aspect for aspect in self.aspects if aspect not in aspect_scores]
+        if missing_aspects:
+            aspect_scores.update(self._get_per_aspect_scores(missing_aspects, source_text, output_text))
+
+        return {aspect: aspect_scores[aspect] for aspect in self.aspects}
+
+    def _get_multi_aspect_scores(self, source_text: str, output_text: str) -> dict:
+        """모든 항목을 한 번에 채점합니다. 형식에 맞지 않는 항목은 결과에서 제외됩니다."""
+        try:
+            response = cached_chat_completion(
+                self.client,
+                "reflexion",
+                "evaluator_multi_aspect",
+                model=self.model_name,
+                messages=[{"role": "system", "content": self._create_multi_aspect_prompt(source_text, output_text)}],
+                response_format=create_geval_format(ASPECT_SCORE_RANGES),
+                temperature=0.7,
+                max_tokens=100,
+                n=1,
+            )
+        except openai.BadRequestError as e:
+            # response_format을 지원하지 않는 모델이면 이후에는 항목 별로 채점
+            print(f"[Warning] multi_aspect g-eval을 사용할 수 없어 per_aspect로 전환합니다: {e}")
+            self.mode = "per_aspect"
+            return {}
+
+        TokenUsageCounter.add_usage("reflexion", "evaluator_multi_aspect", response.usage.total_tokens)
+
+        try:
+            scores = json.loads(response.choices[0].message.content)
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"[Error] eval_type=report, aspect=all, error={e}")
+            return {}
+
+        aspect_scores = {}
+        for aspect, (min_score, max_score) in ASPECT_SCORE_RANGES.items():
+            if isinstance(scores.get(aspect), (int, float)):
+                aspect_scores[aspect] = float(min(max(scores[aspect], min_score), max_score))
+        return aspect_scores
 
+    def _get_per_aspect_scores(self, aspects: list[str], source_text: str, output_text: str) -> dict:
         total_token_usage = 0
 
         aspect_scores = {}
-        for aspect in self.aspects:
+        for aspect in aspects:
             cur_prompt = self._create_aspect_prompt(aspect, source_text, output_text)
 
             # OpenAI API 호출
-            response = self.client.chat.completions.create(
+            response = cached_chat_completion(
+                self.client,
+                "reflexion",
+                "evaluator_per_aspect",
                 model=self.model_name,
                 messages=[{"role": "system", "content": cur_prompt}],
                 temperature=0.7,
@@ -51,17 +126,22 @@ class ReflexionEvaluator:
 
             total_token_usage += response.usage.total_tokens
 
-        TokenUsageCounter.add_usage("reflexion", "evaluator", total_token_usage)
+        TokenUsageCounter.add_usage("reflexion", "evaluator_per_aspect", total_token_usage)
 
         return aspect_scores
 
     def _create_aspect_prompt(self, aspect: str, source_text: str, output_text: str) -> str:
-        with open(f"{self.prompt_path}{aspect}.txt", "r", encoding="utf-8") as f:
-            base_prompt = f.read()
+        base_prompt = PromptRegistry.get_by_path(f"{self.prompt_path}{aspect}.txt")
 
         # {Document}, {Summary} 치환
         return base_prompt.format(Document=source_text, Summary=output_text)
 
+    def _create_multi_aspect_prompt(self, source_text: str, output_text: str) -> str:
+        base_prompt = PromptRegistry.get_raw("reflexion/g_eval_multi_aspect.txt")
+        aspects_description = PromptRegistry.get_raw("reflexion/g_eval/aspects_description_final.txt")
+
+        return base_prompt.format(Aspects=aspects_description.strip(), Document=source_text, Summary=output_text)
+
     def _extract_score(self, gpt_text: str):
         # 정규표현식으로 숫자만 추출, 예: "abc123def" -> numbers = ['1','2','3']
         numbers = re.findall(r"\d", gpt_text)
@@ -0,0 +1,32 @@
+def create_geval_format(aspect_score_ranges: dict[str, tuple[int, int]]) -> dict:
+    """
+    모든 평가 항목(aspect)의 점수를 한 번의 요청으로 받을 때 사용할 response_format을 생성합니다.
+    항목마다 점수 범위(minimum, maximum)가 제한된 숫자 필드를 가집니다.
+
+    Args:
+        aspect_score_ranges (dict[str, tuple[int, int]]): 평가 항목 -> (최저 점수, 최고 점수)
+
+    Returns:
+        dict: chat.completions.create의 response_format 인자
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "g_eval_scores",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    aspect: {
+                        "type": "number",
+                        "minimum": min_score,
+                        "maximum": max_score,
+                        "description": f"{aspect} 점수({min_score}-{max_score})입니다.",
+                    }
+                    for aspect, (min_score, max_score) in aspect_score_ranges.items()
+                },
+                "required": list(aspect_score_ranges),
+                "additionalProperties": False,
+            },
+        },
+    }
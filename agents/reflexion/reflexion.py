@@ -1,3 +1,7 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
 from agents.reflexion.evaluator import ReflexionEvaluator
 from agents.reflexion.self_reflection import ReflexionSelfReflection
 from agents.summary.summary_agent import SummaryAgent
@@ -16,6 +20,8 @@ class ReflexionFramework:
         self.self_reflection = ReflexionSelfReflection()
         self.threshold = Config.config["reflexion"]["threshold"]
         self.max_iteration = Config.config["reflexion"]["max_iteration"]
+        self.strategy = Config.config["reflexion"]["strategy"]
+        self.parallel_config = Config.config["reflexion"]["parallel"]
 
     def process(self, origin_mail) -> str:
         """
@@ -26,6 +32,9 @@ class ReflexionFramework:
         Returns:
             모든 aspect 점수의 평균값이 제일 높은 text가 반환됩니다.
         """
+        if self.strategy == "parallel":
+            return self.process_parallel(origin_mail)
+
         outputs = []
         eval_results = []
         final_output = ""
@@ -58,6 +67,109 @@ class ReflexionFramework:
 
         return final_output
 
+    def process_parallel(self, origin_mail: str) -> str:
+        """
+        서로 다른 temperature/seed로 후보 리포트를 동시에 생성하고 동시에 평가하여 평균 점수가 가장 높은 리포트를 반환합니다.
+        reflection_round가 켜져 있고 최고 점수가 threshold에 못 미치면 최고 후보에 대해 한 번만 성찰 후 다시 생성합니다.
+        latency_budget_seconds가 지나면 그때까지 평가가 끝난 후보 중에서 선택하고,
+        아직 실행 중인 후보는 다음 LLM 호출 전에 스스로 중단합니다.
+        """
+        deadline = time.monotonic() + self.parallel_config["latency_budget_seconds"]
+        candidate_agents = self._create_candidate_agents()
+        has_result = threading.Event()
+
+        def generate_and_evaluate(agent: SummaryAgent) -> tuple[str, dict]:
+            return self._generate_and_evaluate(agent, origin_mail, deadline, has_result)
+
+        executor = ThreadPoolExecutor(max_workers=len(candidate_agents))
+        try:
+            futures = [executor.submit(generate_and_evaluate, agent) for agent in candidate_agents]
+            results = self._collect_results(futures, deadline, wait_for_first=True)
+
+            best_output, best_eval_result = max(results, key=lambda result: self._average_score(result[1]))
+            if (
+                self.parallel_config["reflection_round"]
+                and self._average_score(best_eval_result) < self.threshold
+                and time.monotonic() < deadline
+            ):
+                self.self_reflection.generate_reflection(
+                    origin_mail, best_output, self._create_eval_result_str(best_eval_result)
+                )
+                future = executor.submit(generate_and_evaluate, self.summary_agent)
+                results += self._collect_results([future], deadline, wait_for_first=False)
+        finally:
+            # 예산 안에 끝나지 않은 후보는 기다리지 않는다 (실행 중인 후보는 deadline을 보고 스스로 중단)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        outputs = [output for output, _ in results]
+        eval_results = [eval_result for _, eval_result in results]
+        self._print_result(eval_results, outputs)
+
+        return max(results, key=lambda result: self._average_score(result[1]))[0]
+
+    def _create_candidate_agents(self) -> list[SummaryAgent]:
+        temperatures = self.parallel_config["temperatures"]
+        return [
+            SummaryAgent(
+                model_name="solar-pro",
+                summary_type="final",
+                temperature=temperatures[i % len(temperatures)],
+                seed=Config.config["seed"] + i,
+            )
+            for i in range(self.parallel_config["num_candidates"])
+        ]
+
+    def _generate_and_evaluate(
+        self, summary_agent: SummaryAgent, origin_mail: str, deadline: float, has_result: threading.Event
+    ) -> tuple[str, dict]:
+        """
+        후보 리포트 하나를 생성하고 평가합니다.
+        deadline이 지났고 이미 평가가 끝난 후보가 있으면 남은 LLM 호출(재시도, 평가)을 하지 않고 중단합니다.
+        (성공한 후보가 하나도 없으면 deadline이 지나도 계속 진행)
+        """
+
+        def should_stop() -> bool:
+            return time.monotonic() >= deadline and has_result.is_set()
+
+        output_text = summary_agent.process_with_reflection(
+            origin_mail, self.self_reflection.reflection_memory, should_stop=should_stop
+        )
+        if should_stop():
+            raise TimeoutError("latency budget exceeded before evaluation")
+        eval_result = self.evaluator.get_geval_scores(origin_mail, output_text)
+        has_result.set()
+        return output_text, eval_result
+
+    @staticmethod
+    def _collect_results(futures: list[Future], deadline: float, wait_for_first: bool) -> list[tuple[str, dict]]:
+        """
+        deadline까지 성공한 후보의 (리포트, 평가 결과)를 제출 순서대로 반환합니다.
+        실패한 후보는 로그만 남기고 건너뛰며, wait_for_first이면 성공한 후보가 하나도 없을 때만 예외를 발생시킵니다.
+        """
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        # 예산을 넘겨도 적어도 하나의 성공한 후보는 필요하다
+        while wait_for_first and pending and all(future.exception() is not None for future in done):
+            newly_done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            done |= newly_done
+
+        results, errors = [], []
+        for future in futures:
+            if future not in done:
+                continue
+            if future.exception() is not None:
+                print(f"[Error] Reflexion 후보 생성/평가 실패: {future.exception()!r}")
+                errors.append(future.exception())
+                continue
+            results.append(future.result())
+
+        if wait_for_first and not results:
+            raise errors[0]
+        return results
+
+    @staticmethod
+    def _average_score(eval_result: dict) -> float:
+        return round(sum(eval_result.values()) / len(eval_result), 1)
+
     def _create_eval_result_str(self, eval_result: dict):
         return "\n".join([f"항목: {aspect} 점수: {score}" for aspect, score in eval_result.items()])
 
@@ -1,6 +1,6 @@
-from openai import OpenAI
-
-from utils.configuration import Config
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.response_cache import cached_chat_completion
+from prompt.prompt_registry import PromptRegistry
 from utils.decorators import retry_with_exponential_backoff
 from utils.token_usage_counter import TokenUsageCounter
 
@@ -11,13 +11,11 @@ class ReflexionSelfReflection:
         self.temperature = 0.7
         self.seed = 42
         self.reflection_memory: list[str] = []
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
+        self.client = UpstageClientRegistry.get_client()
         # Reflexion 프롬프트 템플릿을 읽어온다
-        with open("prompt/template/reflexion/reflexion_final.txt", "r", encoding="utf-8") as file:
-            self.reflection_template = file.read()
+        self.reflection_template = PromptRegistry.get_raw("reflexion/reflexion_final.txt")
         # aspect 별 채점 기준을 읽어온다
-        with open("prompt/template/reflexion/g_eval/aspects_description_final.txt", "r", encoding="utf-8") as file:
-            self.aspects_description = file.read()
+        self.aspects_description = PromptRegistry.get_raw("reflexion/g_eval/aspects_description_final.txt")
 
     @retry_with_exponential_backoff()
     def generate_reflection(self, source_text, output_text, eval_result):
@@ -44,8 +42,14 @@ class ReflexionSelfReflection:
         ]
 
         # 모델에게 메시지를 전달해 리플렉션 결과 받기
-        reflection_response = self.client.chat.completions.create(
-            model=self.model_name, messages=messages, temperature=self.temperature, seed=self.seed
+        reflection_response = cached_chat_completion(
+            self.client,
+            "reflexion",
+            "self-reflection",
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            seed=self.seed,
         )
         reflection_text = reflection_response.choices[0].message.content
 
@@ -1,13 +1,15 @@
 import json
 
-from openai import OpenAI
 from openai.types.chat.chat_completion import ChatCompletion
 
 from agents.self_refine.json_formats import FEEDBACK_FORMAT
-from agents.utils.groundness_check import check_groundness
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.groundness_check import GroundednessService
+from agents.utils.response_cache import acached_chat_completion
 from gmail_api.mail import Mail
+from prompt.prompt_registry import PromptRegistry
 from utils.configuration import Config
-from utils.decorators import retry_with_exponential_backoff
+from utils.decorators import async_retry_with_exponential_backoff
 from utils.token_usage_counter import TokenUsageCounter
 
 
@@ -27,50 +29,60 @@ class SelfRefineAgent:
         self.model_name = model_name
         self.temperature = temperature
         self.seed = seed
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
-
-    @retry_with_exponential_backoff()
-    def feedback(self, mail: Mail, summary: str) -> ChatCompletion:
-        with open("prompt/template/self_refine/feedback_system.txt", "r", encoding="utf-8") as file:
-            system_prompt = file.read().strip()
-        with open("prompt/template/self_refine/feedback_user.txt", "r", encoding="utf-8") as file:
-            user_prompt = file.read().strip().format(mail=str(mail), summary=summary)
-        return self.client.chat.completions.create(
+
+    @staticmethod
+    def _build_feedback_messages(mail: Mail, summary: str) -> list[dict]:
+        system_prompt = PromptRegistry.get("self_refine", "feedback_system.txt")
+        user_prompt = PromptRegistry.get("self_refine", "feedback_user.txt").format(mail=str(mail), summary=summary)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @staticmethod
+    def _build_refine_messages(mail: Mail, summary: str, feedback: str) -> list[dict]:
+        system_prompt = PromptRegistry.get("self_refine", "refine_system.txt")
+        user_prompt = PromptRegistry.get("self_refine", "refine_user.txt").format(
+            mail=str(mail), summary=summary, feedback=feedback
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    @async_retry_with_exponential_backoff()
+    async def afeedback(self, mail: Mail, summary: str) -> ChatCompletion:
+        return await acached_chat_completion(
+            UpstageClientRegistry.get_async_client(),
+            self.__class__.__name__,
+            "feedback",
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            messages=self._build_feedback_messages(mail, summary),
             response_format=FEEDBACK_FORMAT,
             temperature=self.temperature,
             seed=self.seed,
         )
 
-    @retry_with_exponential_backoff()
-    def refine(self, mail: Mail, summary: str, feedback: str) -> ChatCompletion:
-        with open("prompt/template/self_refine/refine_system.txt", "r", encoding="utf-8") as file:
-            system_prompt = file.read().strip()
-        with open("prompt/template/self_refine/refine_user.txt", "r", encoding="utf-8") as file:
-            user_prompt = file.read().strip().format(mail=str(mail), summary=summary, feedback=feedback)
-
-        return self.client.chat.completions.create(
+    @async_retry_with_exponential_backoff()
+    async def arefine(self, mail: Mail, summary: str, feedback: str) -> ChatCompletion:
+        return await acached_chat_completion(
+            UpstageClientRegistry.get_async_client(),
+            self.__class__.__name__,
+            "refine",
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            messages=self._build_refine_messages(mail, summary, feedback),
             temperature=self.temperature,
             seed=self.seed,
         )
 
-    @retry_with_exponential_backoff()
-    def process(self, mail: Mail, summary: str):
+    @async_retry_with_exponential_backoff()
+    async def aprocess(self, mail: Mail, summary: str):
         """
-        Self-refine 하여 최종 결과물을 반환합니다.
+        Self-refine 하여 최종 결과물을 반환합니다. 여러 메일을 동시에 Self-refine 할 수 있도록 비동기로 동작합니다.
 
         Args:
-            data (Mail | dict[str, Mail]): 입력 데이터.
-            model (BaseAgent): 데이터를 처리하는 모델(ex. SummaryAgent).
+            mail (Mail): 요약한 메일
+            summary (str): SummaryAgent가 생성한 요약문
 
         Return:
             str: Self-refine을 거친 최종 결과물.
@@ -78,14 +90,10 @@ class SelfRefineAgent:
         max_iteration = Config.config["self_refine"]["max_iteration"]
 
         for i in range(max_iteration):
-            groundness = check_groundness(
-                str(mail),
-                summary,
-                self.__class__.__name__,
-            )
+            groundness = await GroundednessService.acheck(mail, summary, self.__class__.__name__)
             print(f"Self-refine {i + 1} 회차")
 
-            feedback_response: ChatCompletion = self.feedback(mail, summary)
+            feedback_response: ChatCompletion = await self.afeedback(mail, summary)
             TokenUsageCounter.add_usage(self.__class__.__name__, "feedback", feedback_response.usage.total_tokens)
 
             feedback = json.loads(feedback_response.choices[0].message.content)
@@ -94,7 +102,7 @@ class SelfRefineAgent:
                 print(f"Self-refine {i + 1} 회차에서 종료")
                 break
 
-            revision_response: ChatCompletion = self.refine(mail, summary, feedback["issues"])
+            revision_response: ChatCompletion = await self.arefine(mail, summary, feedback["issues"])
             summary = revision_response.choices[0].message.content
             TokenUsageCounter.add_usage(self.__class__.__name__, "refine", revision_response.usage.total_tokens)
 
@@ -1,9 +1,14 @@
-from openai import OpenAI
+from typing import Callable, Optional, Union
 
-from agents.utils.groundness_check import check_groundness
+from openai.types.chat.chat_completion import ChatCompletion
+
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.groundness_check import GroundednessService
+from agents.utils.response_cache import acached_chat_completion, cached_chat_completion
 from agents.utils.utils import build_messages
-from utils.configuration import Config
-from utils.decorators import retry_with_exponential_backoff
+from gmail_api.mail import Mail
+from prompt.prompt_registry import PromptRegistry
+from utils.decorators import async_retry_with_exponential_backoff, retry_with_exponential_backoff
 from utils.token_usage_counter import TokenUsageCounter
 
 
@@ -32,55 +37,102 @@ class SummaryAgent:
         self.summary_type = summary_type
         self.temperature = temperature
         self.seed = seed
-        self.client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
+        self.client = UpstageClientRegistry.get_client()
+
+    def process_with_reflection(
+        self,
+        mail: str,
+        reflections: list = [],
+        max_iteration: int = 3,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """should_stop이 True를 반환하면 Groundness Check 재시도를 멈추고 마지막 생성 결과를 반환합니다."""
+        input_reflections = "\n".join(reflections) if reflections else "제공된 피드백 없음"
+
+        system_prompt = PromptRegistry.get("reflexion", "single_reflexion_system.txt")
+        user_prompt = PromptRegistry.get("reflexion", "single_reflexion_user.txt").format(
+            mail=mail, previous_reflections=input_reflections
+        )
 
-    def process_with_reflection(self, mail: str, reflections: list = [], max_iteration: int = 3) -> str:
-        input_reflections = "제공된 피드백 없음" if reflections else "\n".join(reflections)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        with open("prompt/template/reflexion/single_reflexion_system.txt", "r", encoding="utf-8") as file:
-            system_prompt = file.read().strip()
-        with open("prompt/template/reflexion/single_reflexion_user.txt", "r", encoding="utf-8") as file:
-            user_prompt = file.read().strip()
+        # max_iteration 번 Groundness Check 수행
+        return self._generate_with_groundedness(mail, messages, max_iteration, should_stop)
 
-        user_prompt = user_prompt.format(mail=mail, previous_reflections=input_reflections)
+    def process_partial_report(self, summaries: str, category: str, max_iteration: int = 3) -> str:
+        """같은 분류에 속한 메일 요약문들을 하나의 부분 리포트로 합칩니다. (계층적 리포트 생성에 사용)"""
+        system_prompt = PromptRegistry.get("reflexion", "partial_report_system.txt")
+        user_prompt = PromptRegistry.get("reflexion", "partial_report_user.txt").format(
+            category=category, summaries=summaries
+        )
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ]
 
-        # max_iteration 번 Groundness Check 수행
-        return self._generate_with_groundedness(mail, messages, max_iteration)
+        return self._generate_with_groundedness(summaries, messages, max_iteration)
 
-    def process(self, mail: str, max_iteration: int = 3) -> str:
-        messages = build_messages(template_type="summary", target_range=self.summary_type, action="summary", mail=mail)
+    async def aprocess(self, mail: Union[str, Mail], max_iteration: int = 3) -> str:
+        """메일 하나를 요약합니다. 여러 메일을 동시에 요약할 수 있도록 비동기로 동작합니다."""
+        messages = build_messages(
+            template_type="summary", target_range=self.summary_type, action="summary", mail=str(mail)
+        )
 
-        return self._generate_with_groundedness(mail, messages, max_iteration)
+        return await self._agenerate_with_groundedness(mail, messages, max_iteration)
 
     @retry_with_exponential_backoff()
-    def _generate_with_groundedness(self, mail: str, messages: list[dict], max_iteration: int):
+    def _generate_with_groundedness(
+        self,
+        mail: str,
+        messages: list[dict],
+        max_iteration: int,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ):
         for i in range(max_iteration):
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                # ./prompt/template/summary/{self.summary_type}_summary_system(혹은 user).txt 템플릿에서 프롬프트 생성
-                messages=messages,
-                temperature=self.temperature,
-                seed=self.seed,
-            )
+            response = cached_chat_completion(self.client, **self._build_request(messages, i))
+            groundness = GroundednessService.check(mail, response.choices[0].message.content, self.__class__.__name__)
+            if self._record_attempt(i, response, groundness) or (should_stop is not None and should_stop()):
+                break
 
-            TokenUsageCounter.add_usage(
-                self.__class__.__name__, f"{self.summary_type}_summary", response.usage.total_tokens
-            )
+        return response.choices[0].message.content
 
-            # Groundness Check
-            groundness = check_groundness(
-                mail,
-                response.choices[0].message.content,
-                self.__class__.__name__,
+    @async_retry_with_exponential_backoff()
+    async def _agenerate_with_groundedness(self, mail: Union[str, Mail], messages: list[dict], max_iteration: int):
+        """_generate_with_groundedness의 비동기 버전 (요청 구성과 결과 기록은 두 버전이 같은 함수를 사용)"""
+        for i in range(max_iteration):
+            response = await acached_chat_completion(
+                UpstageClientRegistry.get_async_client(), **self._build_request(messages, i)
             )
-
-            print(f"{i + 1}번째 사실 확인: {groundness}")
-            if groundness == "grounded":
+            groundness = await GroundednessService.acheck(
+                mail, response.choices[0].message.content, self.__class__.__name__
+            )
+            if self._record_attempt(i, response, groundness):
                 break
 
         return response.choices[0].message.content
+
+    def _build_request(self, messages: list[dict], attempt: int) -> dict:
+        """(a)cached_chat_completion에 client 외에 넘길 인자를 만듭니다."""
+        return {
+            "agent_name": self.__class__.__name__,
+            "usage_type": f"{self.summary_type}_summary",
+            # 재시도마다 다른 캐시 항목을 사용해야 같은 요약문이 반복되지 않는다
+            "cache_salt": f"attempt:{attempt}" if attempt else None,
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            "seed": self.seed,
+        }
+
+    def _record_attempt(self, attempt: int, response: ChatCompletion, groundness: str) -> bool:
+        """토큰 사용량과 Groundness Check 결과를 기록하고, 요약문이 사실에 근거하면 True를 반환합니다."""
+        TokenUsageCounter.add_usage(
+            self.__class__.__name__, f"{self.summary_type}_summary", response.usage.total_tokens
+        )
+
+        print(f"{attempt + 1}번째 사실 확인: {groundness}")
+        return groundness == "grounded"
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import time
+import weakref
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from utils.configuration import Config
+
+UPSTAGE_BASE_URL = "https://api.upstage.ai/v1/solar"
+
+
+def _mask_key(api_key: str) -> str:
+    """통계에 API 키 원문이 남지 않도록 해시 앞부분과 마지막 4자리만 사용합니다."""
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+    return f"{digest}...{api_key[-4:]}"
+
+
+class UpstageClientRegistry:
+    """
+    API 키 별로 오래 유지되는 OpenAI(Upstage) 클라이언트를 제공합니다.
+
+    - 모든 클라이언트가 하나의 httpx 연결 풀을 공유하여 keep-alive 연결(TLS 세션)을 재사용합니다.
+    - h2 패키지가 설치되어 있으면 HTTP/2를 사용합니다.
+    - httpx.AsyncClient는 이벤트 루프에 묶이므로 비동기 클라이언트는 이벤트 루프 별로 따로 만듭니다.
+    - 요청 수, 오류 수, 누적 응답 시간을 API 키 별로 집계합니다.
+    """
+
+    _clients: dict[str, OpenAI] = {}
+    _http_client: Optional[httpx.Client] = None
+    # 이벤트 루프 -> (공유 httpx.AsyncClient, API 키 -> AsyncOpenAI)
+    _async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+    _stats: dict[str, dict] = defaultdict(lambda: {"requests": 0, "errors": 0, "elapsed": 0.0})
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, api_key: Optional[str] = None) -> OpenAI:
+        api_key = api_key or Config.user_upstage_api_key
+        with cls._lock:
+            if api_key not in cls._clients:
+                if cls._http_client is None:
+                    cls._http_client = httpx.Client(**cls._http_options(), event_hooks=cls._event_hooks())
+                cls._clients[api_key] = OpenAI(api_key=api_key, base_url=UPSTAGE_BASE_URL, http_client=cls._http_client)
+            return cls._clients[api_key]
+
+    @classmethod
+    def get_async_client(cls, api_key: Optional[str] = None) -> AsyncOpenAI:
+        """현재 실행 중인 이벤트 루프에서 사용할 비동기 클라이언트를 반환합니다."""
+        api_key = api_key or Config.user_upstage_api_key
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            if loop not in cls._async_clients:
+                http_client = httpx.AsyncClient(**cls._http_options(), event_hooks=cls._async_event_hooks())
+                cls._async_clients[loop] = (http_client, {})
+            http_client, clients = cls._async_clients[loop]
+            if api_key not in clients:
+                clients[api_key] = AsyncOpenAI(api_key=api_key, base_url=UPSTAGE_BASE_URL, http_client=http_client)
+            return clients[api_key]
+
+    @classmethod
+    async def aclose_loop_clients(cls) -> None:
+        """현재 이벤트 루프의 비동기 연결 풀을 닫습니다. asyncio.run이 끝나기 전에 호출합니다."""
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            entry = cls._async_clients.pop(loop, None)
+        if entry is not None:
+            await entry[0].aclose()
+
+    @classmethod
+    def get_stats(cls) -> dict[str, dict]:
+        """
+        Returns:
+            dict: 마스킹된 API 키 -> {"requests", "errors", "avg_latency"}
+        """
+        with cls._lock:
+            return {
+                key: {
+                    "requests": stat["requests"],
+                    "errors": stat["errors"],
+                    "avg_latency": stat["elapsed"] / stat["requests"] if stat["requests"] else 0.0,
+                }
+                for key, stat in cls._stats.items()
+            }
+
+    @classmethod
+    def print_stats(cls) -> None:
+        print(f"{'=' * 20}LLM CLIENT{'=' * 20}\n")
+        for key, stat in cls.get_stats().items():
+            print(
+                f"{key}: requests={stat['requests']}, errors={stat['errors']}, "
+                f"avg_latency={stat['avg_latency']:.2f}s"
+            )
+        print()
+
+    @staticmethod
+    def _http_options() -> dict:
+        client_config = Config.config["llm_client"]
+        return {
+            "http2": client_config["http2"] and importlib.util.find_spec("h2") is not None,
+            "timeout": httpx.Timeout(client_config["timeout"], connect=client_config["connect_timeout"]),
+            "limits": httpx.Limits(
+                max_connections=client_config["max_connections"],
+                max_keepalive_connections=client_config["max_keepalive_connections"],
+                keepalive_expiry=client_config["keepalive_expiry"],
+            ),
+        }
+
+    # 응답 시간 및 오류 집계용 httpx event hook
+    @classmethod
+    def _record(cls, response: httpx.Response) -> None:
+        api_key = response.request.headers.get("Authorization", "").removeprefix("Bearer ")
+        elapsed = time.monotonic() - response.request.extensions.get("started_at", time.monotonic())
+        with cls._lock:
+            stat = cls._stats[_mask_key(api_key)]
+            stat["requests"] += 1
+            stat["elapsed"] += elapsed
+            if response.status_code >= 400:
+                stat["errors"] += 1
+
+    @staticmethod
+    def _mark_start(request: httpx.Request) -> None:
+        request.extensions["started_at"] = time.monotonic()
+
+    @classmethod
+    def _event_hooks(cls) -> dict:
+        return {"request": [cls._mark_start], "response": [cls._record]}
+
+    @classmethod
+    def _async_event_hooks(cls) -> dict:
+        async def mark_start(request: httpx.Request) -> None:
+            cls._mark_start(request)
+
+        async def record(response: httpx.Response) -> None:
+            cls._record(response)
+
+        return {"request": [mark_start], "response": [record]}
@@ -1,22 +1,148 @@
-from openai import OpenAI
+import asyncio
+import hashlib
+import threading
+from typing import Union
 
+from openai.types.chat.chat_completion import ChatCompletion
+
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.response_cache import acached_chat_completion, cached_chat_completion
+from gmail_api.mail import Mail
 from utils.configuration import Config
 from utils.token_usage_counter import TokenUsageCounter
 
 
-def check_groundness(context: str, answer: str, agent_name: str = "") -> str:
-    client = OpenAI(api_key=Config.user_upstage_api_key, base_url="https://api.upstage.ai/v1/solar")
-    response = client.chat.completions.create(
+def _build_groundness_messages(context: str, answer: str) -> list[dict]:
+    return [
+        {
+            "role": "user",
+            "content": context,
+        },
+        {"role": "assistant", "content": answer},
+    ]
+
+
+def _record_groundness(response: ChatCompletion, agent_name: str) -> tuple[str, int]:
+    TokenUsageCounter.add_usage(agent_name, "groundness_check", response.usage.total_tokens)
+    return response.choices[0].message.content, response.usage.total_tokens
+
+
+def _request_groundness(context: str, answer: str, agent_name: str) -> tuple[str, int]:
+    response = cached_chat_completion(
+        UpstageClientRegistry.get_client(),
+        agent_name,
+        "groundness_check",
         model="groundedness-check",
-        messages=[
-            {
-                "role": "user",
-                "content": context,
-            },
-            {"role": "assistant", "content": answer},
-        ],
+        messages=_build_groundness_messages(context, answer),
     )
+    return _record_groundness(response, agent_name)
 
-    groundness = response.choices[0].message.content
-    TokenUsageCounter.add_usage(agent_name, "groundness_check", response.usage.total_tokens)
-    return groundness
+
+async def _arequest_groundness(context: str, answer: str, agent_name: str) -> tuple[str, int]:
+    response = await acached_chat_completion(
+        UpstageClientRegistry.get_async_client(),
+        agent_name,
+        "groundness_check",
+        model="groundedness-check",
+        messages=_build_groundness_messages(context, answer),
+    )
+    return _record_groundness(response, agent_name)
+
+
+def check_groundness(context: str, answer: str, agent_name: str = "") -> str:
+    return _request_groundness(context, answer, agent_name)[0]
+
+
+async def acheck_groundness(context: str, answer: str, agent_name: str = "") -> str:
+    """check_groundness의 비동기 버전"""
+    return (await _arequest_groundness(context, answer, agent_name))[0]
+
+
+class GroundednessService:
+    """
+    (context, answer) 쌍의 Groundness Check 결과를 실행(run) 동안 기억해 두는 서비스입니다.
+    SummaryAgent가 확인한 (메일, 요약) 쌍을 SelfRefineAgent가 다시 확인하거나,
+    Self-refine 중 요약이 바뀌지 않은 회차에서 같은 쌍을 다시 확인할 때 API를 호출하지 않습니다.
+
+    - 키는 context와 answer 각각의 sha256 해시입니다. context가 Mail이면 Mail.content_hash를 사용하며,
+      같은 메일을 str(mail)로 넘긴 경우와 같은 키가 됩니다.
+    - 동시에 같은 쌍을 확인하면(비동기) 먼저 시작한 요청의 결과를 함께 사용합니다.
+    - 생략한 호출은 TokenUsageCounter에 캐시 적중("groundness_memo")과 절약한 토큰으로 기록됩니다.
+    - 파이프라인 실행마다 reset()으로 비웁니다.
+    """
+
+    _results: dict[str, tuple[str, int]] = {}
+    _pending: dict[str, asyncio.Task] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._results = {}
+            cls._pending = {}
+
+    @staticmethod
+    def make_key(context: Union[str, Mail], answer: str) -> str:
+        if isinstance(context, Mail):
+            context_hash = context.content_hash
+        else:
+            context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        answer_hash = hashlib.sha256(answer.encode("utf-8")).hexdigest()
+        return f"{context_hash}:{answer_hash}"
+
+    @classmethod
+    def check(cls, context: Union[str, Mail], answer: str, agent_name: str = "") -> str:
+        if not Config.config["groundness_check"]["memoize"]:
+            return check_groundness(str(context), answer, agent_name)
+
+        key = cls.make_key(context, answer)
+        with cls._lock:
+            result = cls._results.get(key)
+        if result is not None:
+            return cls._record_hit(result, agent_name)
+
+        result = _request_groundness(str(context), answer, agent_name)
+        cls._store(key, result)
+        return result[0]
+
+    @classmethod
+    async def acheck(cls, context: Union[str, Mail], answer: str, agent_name: str = "") -> str:
+        """check의 비동기 버전"""
+        if not Config.config["groundness_check"]["memoize"]:
+            return await acheck_groundness(str(context), answer, agent_name)
+
+        key = cls.make_key(context, answer)
+        with cls._lock:
+            result = cls._results.get(key)
+            task = cls._pending.get(key)
+            if result is None and task is None:
+                task = cls._pending[key] = asyncio.ensure_future(_arequest_groundness(str(context), answer, agent_name))
+                is_owner = True
+            else:
+                is_owner = False
+
+        if result is not None:
+            return cls._record_hit(result, agent_name)
+        if not is_owner:
+            return cls._record_hit(await task, agent_name)
+
+        try:
+            result = await task
+        finally:
+            with cls._lock:
+                cls._pending.pop(key, None)
+        cls._store(key, result)
+        return result[0]
+
+    @classmethod
+    def _store(cls, key: str, result: tuple[str, int]) -> None:
+        with cls._lock:
+            cls._results[key] = result
+        TokenUsageCounter.add_cache_lookup("groundness_memo", "groundness_check", False)
+
+    @staticmethod
+    def _record_hit(result: tuple[str, int], agent_name: str) -> str:
+        groundness, tokens = result
+        TokenUsageCounter.add_cache_lookup("groundness_memo", "groundness_check", True)
+        TokenUsageCounter.add_saving(agent_name, "groundness_memo", tokens)
+        return groundness
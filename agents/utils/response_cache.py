@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat.chat_completion import ChatCompletion
+
+from prompt.prompt_registry import PromptRegistry
+from utils.configuration import Config
+from utils.token_usage_counter import TokenUsageCounter
+
+# 키 구성이나 저장 형식이 바뀌면 버전을 올려 이전 캐시를 무효화한다
+CACHE_VERSION = "chat-completion:v1"
+
+
+class LLMResponseCache:
+    """
+    chat.completions.create 응답을 요청 내용(model, messages, temperature, seed, response_format 등)의
+    해시로 저장하는 영구 캐시입니다. 같은 날짜의 파이프라인을 다시 실행해도 동일한 요청은 다시 비용을 지불하지 않습니다.
+
+    - 키에 PromptRegistry 버전을 포함하므로 템플릿을 수정하면 이전에 캐시된 응답은 사용되지 않습니다.
+    - config의 llm_cache.usage_types에 포함된 호출 종류(TokenUsageCounter의 usage_type)만 캐시합니다.
+    - ttl_hours가 지난 항목은 사용하지 않고, 전체 크기가 max_size_mb를 넘으면 오래 사용되지 않은 항목부터 삭제합니다.
+    - 캐시 적중 시 아낀 토큰 수와 적중/미적중 횟수를 TokenUsageCounter에 기록합니다.
+    """
+
+    _connection: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_enabled(cls, usage_type: str) -> bool:
+        cache_config = Config.config["llm_cache"]
+        return cache_config["enabled"] and usage_type in cache_config["usage_types"]
+
+    @staticmethod
+    def make_key(request: dict) -> str:
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        prompt_version = PromptRegistry.get_version()
+        return hashlib.sha256(f"{CACHE_VERSION}\0{prompt_version}\0{payload}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[ChatCompletion]:
+        ttl_hours = Config.config["llm_cache"]["ttl_hours"]
+        with cls._lock:
+            connection = cls._connect()
+            row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if ttl_hours and time.time() - row[1] > ttl_hours * 3600:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                return None
+            connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+        return ChatCompletion.model_validate_json(row[0])
+
+    @classmethod
+    def put(cls, key: str, response: ChatCompletion) -> None:
+        content = response.model_dump_json()
+        now = time.time()
+        with cls._lock:
+            connection = cls._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, content, len(content.encode("utf-8")), now, now),
+            )
+            cls._evict(connection)
+            connection.commit()
+
+    @classmethod
+    def lookup(cls, agent_name: str, usage_type: str, request: dict) -> tuple[Optional[str], Optional[ChatCompletion]]:
+        """
+        캐시를 조회하고 적중 여부를 TokenUsageCounter에 기록합니다.
+
+        Returns:
+            tuple: (캐시 키, 캐시된 응답) 캐시 대상이 아니면 키가 None, 미적중이면 응답이 None
+        """
+        if not cls.is_enabled(usage_type):
+            return None, None
+
+        key = cls.make_key(request)
+        cached = cls.get(key)
+        TokenUsageCounter.add_cache_lookup("llm_cache", usage_type, cached is not None)
+        if cached is None:
+            return key, None
+
+        TokenUsageCounter.add_saving(agent_name, "llm_cache", cached.usage.total_tokens if cached.usage else 0)
+        # 캐시된 응답은 실제로 토큰을 사용하지 않았으므로 호출한 쪽의 add_usage에 0이 기록되도록 한다
+        if cached.usage:
+            cached.usage.prompt_tokens = cached.usage.completion_tokens = cached.usage.total_tokens = 0
+        return key, cached
+
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        if cls._connection is None:
+            path = Config.config["llm_cache"]["path"]
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # 여러 스레드/코루틴에서 함께 사용하므로 _lock으로 접근을 직렬화한다
+            cls._connection = sqlite3.connect(path, check_same_thread=False)
+            cls._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+        return cls._connection
+
+    @classmethod
+    def _evict(cls, connection: sqlite3.Connection) -> None:
+        max_size = Config.config["llm_cache"]["max_size_mb"] * 1024 * 1024
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= max_size:
+            return
+
+        rows = connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evicted_keys = []
+        for key, size in rows:
+            if total_size <= max_size:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+
+def cached_chat_completion(
+    client: OpenAI, agent_name: str, usage_type: str, cache_salt: Optional[str] = None, **kwargs
+) -> ChatCompletion:
+    """
+    client.chat.completions.create(**kwargs)를 호출하되, usage_type이 캐시 대상이면 LLMResponseCache를 거칩니다.
+    캐시된 응답의 usage는 0으로 반환됩니다.
+
+    Args:
+        cache_salt (str, optional): 같은 요청을 여러 번 샘플링할 때(반복 추론 등) 샘플마다 다른 캐시 항목을 쓰도록 키에 추가할 값
+    """
+    key, cached = LLMResponseCache.lookup(agent_name, usage_type, _with_salt(kwargs, cache_salt))
+    if cached is not None:
+        return cached
+
+    response = client.chat.completions.create(**kwargs)
+    if key is not None:
+        LLMResponseCache.put(key, response)
+    return response
+
+
+async def acached_chat_completion(
+    client: AsyncOpenAI, agent_name: str, usage_type: str, cache_salt: Optional[str] = None, **kwargs
+) -> ChatCompletion:
+    """cached_chat_completion의 비동기 버전"""
+    key, cached = LLMResponseCache.lookup(agent_name, usage_type, _with_salt(kwargs, cache_salt))
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(**kwargs)
+    if key is not None:
+        LLMResponseCache.put(key, response)
+    return response
+
+
+def _with_salt(request: dict, cache_salt: Optional[str]) -> dict:
+    return request if cache_salt is None else {**request, "_cache_salt": cache_salt}
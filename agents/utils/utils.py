@@ -1,6 +1,5 @@
-import yaml
-
 from prompt.prompt import load_template, load_template_with_variables
+from prompt.prompt_registry import PromptRegistry
 
 
 # YAML 파일에서 카테고리 정보 로드
@@ -19,19 +18,8 @@ def load_categories_from_yaml(classification_type: str, is_prompt: bool = False)
         FileNotFoundError: 파일이 존재하지 않을 경우 예외를 발생시킵니다.
         ValueError: YAML 파일 파싱 중 오류가 발생할 경우 예외를 발생시킵니다.
     """
-    yaml_file_path = f"prompt/template/classification/{classification_type}.yaml"
-    try:
-        with open(yaml_file_path, "r", encoding="utf-8") as file:
-            categories: dict = yaml.safe_load(file)
-
-            if is_prompt:
-                return [{"name": category["name"], "rubric": category["rubric"]} for category in categories]
-            else:
-                return [{"name": category["name"], "description": category["description"]} for category in categories]
-    except FileNotFoundError:
-        raise FileNotFoundError(f"카테고리 파일 {yaml_file_path}이(가) 존재하지 않습니다.")
-    except yaml.YAMLError as e:
-        raise ValueError(f"YAML 파일 파싱 중 오류 발생: {e}")
+    # 시작 시 PromptRegistry에 읽어둔 YAML을 사용
+    return PromptRegistry.get_categories(classification_type, is_prompt)
 
 
 # 시스템 및 사용자 프롬프트 생성 함수
@@ -1,15 +1,25 @@
 from dotenv import load_dotenv
 
+from agents.utils.client_registry import UpstageClientRegistry
 from gmail_api.gmail_service import GmailService
 from pipelines.pipeline import pipeline
+from prompt.prompt_registry import PromptRegistry
 from utils.configuration import Config
-from utils.db_utils import authenticate_gmail, fetch_users, insert_report
+from utils.db_utils import authenticate_gmail, fetch_users, has_history_id_column, insert_report, update_history_id
 from utils.token_usage_counter import TokenUsageCounter
 
 
 def main():
     load_dotenv()
     Config.load()
+    PromptRegistry.load()
+
+    # 사용자 별 예외 처리에 묻히지 않도록, 증분 동기화 기준점을 저장할 수 없으면 시작 전에 중단
+    incremental_sync = Config.config["gmail"]["sync_mode"] == "incremental"
+    if incremental_sync and not has_history_id_column():
+        raise RuntimeError(
+            "user_tb.history_id 칼럼이 없습니다. server/.db/migrations/001_add_user_history_id.sql을 먼저 실행하세요."
+        )
 
     # 유저 테이블 불러오기
     users = fetch_users()
@@ -23,18 +33,23 @@ def main():
             service = authenticate_gmail(user)
             Config.user_upstage_api_key = user["upstage_api_key"]
             # GmailService 인스턴스 생성
-            gmail_service = GmailService(service)
+            gmail_service = GmailService(service, history_id=user.get("history_id"))
 
-            json_checklist, report = pipeline(gmail_service)
+            json_checklist, report = pipeline(gmail_service, str(user["id"]))
             print(f"============ FINAL REPORT of {user['id']} =============")
             print(report)
             print("=======================================================")
 
             if Config.config["token_tracking"]:
                 TokenUsageCounter.plot_token_cost()
+                UpstageClientRegistry.print_stats()
 
             insert_report(user["id"], report, json_checklist)
 
+            # 리포트 생성까지 성공한 경우에만 다음 증분 동기화의 기준점을 갱신
+            if incremental_sync and gmail_service.latest_history_id:
+                update_history_id(user["id"], gmail_service.latest_history_id)
+
         except Exception as e:
             print(e)
 
@@ -39,8 +39,11 @@ class DataFrameManager:
             results, ground_truth
         )
 
+        # adaptive voting으로 조기 종료된 메일은 투표 수가 적으므로 남은 inference 칼럼을 비워둔다
+        padded_results = results[: self.inference_count] + [None] * (self.inference_count - len(results))
+
         new_row = pd.DataFrame(
-            [[mail_id, ground_truth] + results + [entropy_val, diversity_val, p_val, acc_val, c_v]],
+            [[mail_id, ground_truth] + padded_results + [entropy_val, diversity_val, p_val, acc_val, c_v]],
             columns=self.columns,
         )
 
@@ -65,7 +65,7 @@ class MetricCalculator:
     def compute_binary_confusion_matrix(eval_df: pd.DataFrame, category: str, inference_count: int):
         """
         - 전체 데이터셋을 대상으로, 'category' vs. 'not-category'로 2×2 Confusion Matrix 계산.
-        - inference_count 회 각각을 샘플로 본다.
+        - inference_count 회 각각을 샘플로 본다. (조기 종료로 비어 있는 inference는 제외)
         """
         all_predictions = []
         all_ground_truths = []
@@ -74,6 +74,8 @@ class MetricCalculator:
             gt = row["ground_truth"]
             for i in range(inference_count):
                 pred = row[f"inference_{i+1}"]
+                if pd.isna(pred):
+                    continue
                 # ground_truth가 category이면 Positive, 아니면 Negative
                 all_ground_truths.append("Positive" if gt == category else "Negative")
                 # 예측이 category이면 Positive, 아니면 Negative
@@ -130,6 +132,8 @@ class MetricCalculator:
             gt = row["ground_truth"]
             for col in inf_cols:
                 pred = row[col]
+                if pd.isna(pred):
+                    continue
                 total_count += 1
                 if pred == gt:
                     total_correct += 1
@@ -169,7 +173,7 @@ class MetricCalculator:
 
         for gt, group_df in grouped:
             # 해당 GT 그룹 내 '여러 메일의 inference 결과'를 하나로 통합
-            cat_results = group_df.iloc[:, 2:-5].values.flatten().tolist()
+            cat_results = [pred for pred in group_df.iloc[:, 2:-5].values.flatten().tolist() if not pd.isna(pred)]
             (entropy_value, diversity_index, p_value, accuracy, _, _, c_v) = MetricCalculator.compute_metrics(
                 cat_results, gt
             )
@@ -191,6 +195,8 @@ class MetricCalculator:
             gt = row["ground_truth"]
             for i in range(inference_count):
                 pred = row[f"inference_{i+1}"]
+                if pd.isna(pred):
+                    continue
                 all_preds.append(pred)
                 all_gts.append(gt)
 
@@ -1,60 +1,336 @@
+import logging
+import time
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
 
+from googleapiclient.errors import HttpError
 from tqdm import tqdm
 
+from gmail_api.image_fetcher import ImageFetcher
+from gmail_api.image_filter import TrivialImageFilter
 from gmail_api.mail import Mail
+from gmail_api.mail_filter import MailFilterChain, MailMetadata
+from gmail_api.parse_cache import ParsedDocumentCache
 from gmail_api.utils import (
     decode_base64,
-    delete_file,
-    parse_document,
+    parse_base64_data,
     replace_image_pattern_with,
     replace_url_pattern_from,
-    save_file,
 )
 from utils.configuration import Config
 
+# Gmail API 메소드 별 quota unit 소모량 (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.attachments.get": 5,
+    "history.list": 2,
+    "getProfile": 1,
+}
+MAX_BATCH_SIZE = 100  # Gmail batch 요청 하나에 담을 수 있는 최대 호출 수
+MAX_PAGE_SIZE = 500  # messages.list 한 페이지의 최대 메일 수
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    if error.resp.status == 403:
+        reasons = {detail.get("reason") for detail in (error.error_details or []) if isinstance(detail, dict)}
+        return bool(reasons & RATE_LIMIT_REASONS)
+    return False
+
 
 class GmailService:
-    def __init__(self, service):
+    def __init__(self, service, history_id: Optional[str] = None):
+        """
+        Args:
+            service: 인증된 Gmail API 서비스 객체
+            history_id (str, optional): 이전 동기화 시점의 historyId (incremental 모드에서 사용)
+        """
         self.service = service
+        self.sync_mode = Config.config["gmail"]["sync_mode"]
+        self.history_id = history_id
+        # 이번 동기화가 끝난 시점의 historyId, 다음 실행 시 history_id로 넘겨준다
+        self.latest_history_id: Optional[str] = None
+        self.batch_size = min(Config.config["gmail"]["batch_size"], MAX_BATCH_SIZE)
+        self.quota_units_per_second = Config.config["gmail"]["quota_units_per_second"]
+        self.max_retry = Config.config["gmail"]["max_retry"]
+        self.page_size = min(Config.config["gmail"]["page_size"], MAX_PAGE_SIZE)
+        self.filter_chain = MailFilterChain.from_config(Config.config["gmail"]["filters"])
+        # batch로 미리 받아둔 첨부파일 데이터 (attachment id -> base64 data)
+        self._prefetched_attachments: dict[str, str] = {}
+        self.attachment_workers = Config.config["gmail"]["attachment_workers"]
+        self.attachment_spool_size = Config.config["gmail"]["attachment_spool_mb"] * 1024 * 1024
+        self.image_filter = TrivialImageFilter.from_config(Config.config["image_filter"])
+        image_fetch_config = Config.config["image_fetch"]
+        self.image_fetcher = ImageFetcher(
+            max_workers=image_fetch_config["max_workers"],
+            per_host_limit=image_fetch_config["per_host_limit"],
+            max_bytes=image_fetch_config["max_size_mb"] * 1024 * 1024,
+            timeout=image_fetch_config["timeout"],
+            cache_dir=image_fetch_config["cache_dir"],
+        )
+
+    def fetch_mails(self) -> dict[str, Mail]:
+        # 캐시 통계는 클래스 단위로 공유되므로 사용자(실행) 별로 초기화한다
+        ParsedDocumentCache.reset_stats()
+        mail_dict = {mail.message_id: mail for mail in tqdm(self.iter_mails(), desc="Processing Emails")}
+        if ParsedDocumentCache.is_enabled():
+            stats = ParsedDocumentCache.get_stats()
+            print(f"첨부파일 파싱 캐시: hit {stats['hits']}회, miss {stats['misses']}회")
+        if self.image_filter is not None:
+            print(
+                f"의미 없는 이미지 {self.image_filter.get_total_skipped()}개의 파싱을 생략했습니다. "
+                f"{dict(self.image_filter.skipped)}"
+            )
+        return mail_dict
+
+    def iter_mails(self) -> Iterator[Mail]:
+        """
+        설정된 기간(start_date ~ end_date)의 메일을 페이지 단위로 불러오며,
+        파싱이 끝난 Mail 객체를 하나씩 반환합니다.
 
-    def fetch_mails(self):
+        Yields:
+            Mail: 파싱이 완료된 메일 객체
+        """
         start_date = Config.config["gmail"]["start_date"]
         end_date = Config.config["gmail"]["end_date"]
-        n = Config.config["gmail"]["max_mails"]
-
-        messages = self._get_today_n_messages(start_date, n)
-        mail_dict = {}
-        for idx, msg_meta in enumerate(tqdm(messages, desc="Processing Emails")):
-            mail_id = f"{end_date}/{len(messages)-idx:04d}"
-            message = self._get_message_details(msg_meta["id"])
-            body, attachments = self._process_message(message)
-            headers = self._process_headers(message)
-            mail = Mail(msg_meta["id"], mail_id, body, attachments, headers)
-            # 예시로 (광고) 필터만 적용
-            if "(광고)" not in mail.subject:
-                mail_dict[msg_meta["id"]] = mail
-        return mail_dict
+        max_mails = Config.config["gmail"]["max_mails"]
+
+        # before:는 해당 날짜를 포함하지 않으므로 end_date 다음 날로 검색한다
+        before_date = (datetime.strptime(end_date, "%Y/%m/%d") + timedelta(days=1)).strftime("%Y/%m/%d")
+        query = f"after:{start_date} before:{before_date} {self.filter_chain.query()}".strip()
+
+        idx = 0
+        # 첨부파일 파싱(Upstage Document Parse)을 병렬로 수행할 스레드 풀
+        with ThreadPoolExecutor(max_workers=self.attachment_workers) as executor:
+            for message_ids in self._iter_sync_message_id_pages(query, max_mails):
+                # 1단계: 메타데이터만 받아 필터를 통과한 메일만 남긴다
+                message_ids = self._triage(message_ids)
+                if not message_ids:
+                    continue
 
-    def _get_today_n_messages(self, date: str, n: int = 100):
-        message_list = (
-            self.service.users()
+                # 2단계: 남은 메일의 본문과 첨부파일을 받는다
+                message_details = self._batch_get_messages(message_ids)
+                message_parts = {
+                    message_id: self._process_message_part(message_details[message_id].get("payload", {}))
+                    for message_id in message_ids
+                    if message_id in message_details
+                }
+                self._prefetch_attachments(message_parts)
+
+                # 3단계: 페이지 내 모든 메일의 첨부파일을 한꺼번에 병렬로 파싱한다
+                attachment_futures = {
+                    message_id: [self._submit_attachment(executor, message_id, part) for part in attachment_parts]
+                    for message_id, (_, attachment_parts) in message_parts.items()
+                }
+                self._prefetched_attachments.clear()
+
+                for message_id, (body, _) in message_parts.items():
+                    message = message_details[message_id]
+                    idx += 1
+                    mail_id = f"{end_date}/{idx:04d}"
+                    body, attachments = self._process_message(body, attachment_futures[message_id])
+                    headers = self._process_headers(message)
+                    yield Mail(message_id, mail_id, body, attachments, headers)
+
+    def _triage(self, message_ids: list[str]) -> list[str]:
+        """
+        format=metadata로 헤더와 라벨만 받아 필터 체인을 통과한 메일 id만 반환합니다.
+        광고 메일 등은 본문 다운로드와 첨부파일 파싱 없이 걸러집니다.
+        """
+        requests = {
+            message_id: self.service.users()
             .messages()
-            .list(userId="me", maxResults=n, q=f"after:{date}", labelIds=["INBOX"])
-            .execute()
-        )
-        return message_list.get("messages", [])
+            .get(userId="me", id=message_id, format="metadata", metadataHeaders=["From", "Subject"])
+            for message_id in message_ids
+        }
+        metadata_dict = self._execute_batch(requests, QUOTA_UNITS["messages.get"])
 
-    def _get_message_details(self, message_id):
-        return self.service.users().messages().get(userId="me", id=message_id).execute()
+        accepted_ids = [
+            message_id
+            for message_id in message_ids
+            if message_id in metadata_dict and self.filter_chain.accept(MailMetadata(metadata_dict[message_id]))
+        ]
+        if len(accepted_ids) < len(message_ids):
+            print(f"메타데이터 필터로 {len(message_ids) - len(accepted_ids)}개의 메일을 제외했습니다.")
+        return accepted_ids
 
-    def _process_message(self, message):
-        payload = message.get("payload", {})
-        body, filenames = self._process_message_part(message["id"], payload)  # 임시, 아래에서 재호출에 주의
+    def _iter_sync_message_id_pages(self, query: str, max_mails: Optional[int] = None) -> Iterator[list[str]]:
+        """
+        sync_mode에 따라 불러올 메일 id를 페이지 단위로 반환합니다.
+        incremental 모드에서 저장된 historyId가 만료된 경우 전체 기간 조회로 대체합니다.
+        """
+        if self.sync_mode == "incremental" and self.history_id:
+            try:
+                yield from self._iter_history_message_id_pages(self.history_id)
+                return
+            except HttpError as error:
+                if error.resp.status != 404:
+                    raise
+                print(f"historyId {self.history_id}가 만료되어 전체 기간을 다시 조회합니다.")
+
+        # 조회 도중 도착한 메일을 놓치지 않도록 조회 시작 전의 historyId를 기록
+        self.latest_history_id = self.service.users().getProfile(userId="me").execute()["historyId"]
+        yield from self._iter_message_id_pages(query, max_mails)
+
+    def _iter_history_message_id_pages(self, start_history_id: str) -> Iterator[list[str]]:
+        """
+        History API로 start_history_id 이후 받은편지함에 추가된 메일 id만 페이지 단위로 반환합니다.
+        새로 도착한 메일만 조회하므로 max_mails 제한은 적용하지 않습니다.
+
+        Raises:
+            HttpError: historyId가 만료된 경우 404 에러가 발생합니다.
+        """
+        seen_ids = set()
+        page_token = None
+        while True:
+            response = (
+                self.service.users()
+                .history()
+                .list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes=["messageAdded"],
+                    labelId="INBOX",
+                    pageToken=page_token,
+                )
+                .execute()
+            )
+            self.latest_history_id = response.get("historyId", self.latest_history_id)
+
+            message_ids = []
+            for history in response.get("history", []):
+                for added in history.get("messagesAdded", []):
+                    message_id = added["message"]["id"]
+                    if message_id not in seen_ids:
+                        seen_ids.add(message_id)
+                        message_ids.append(message_id)
+            if message_ids:
+                yield message_ids
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+    def _iter_message_id_pages(self, query: str, max_mails: Optional[int] = None) -> Iterator[list[str]]:
+        """
+        nextPageToken을 따라가며 검색된 메일 id를 페이지 단위로 반환합니다.
+
+        Args:
+            query (str): Gmail 검색 쿼리 (q=)
+            max_mails (int, optional): 불러올 메일 최대 개수, None이면 제한 없음
+        """
+        page_token = None
+        remaining = max_mails
+        while remaining is None or remaining > 0:
+            page_size = self.page_size if remaining is None else min(self.page_size, remaining)
+            response = (
+                self.service.users()
+                .messages()
+                .list(userId="me", maxResults=page_size, q=query, labelIds=["INBOX"], pageToken=page_token)
+                .execute()
+            )
+            message_ids = [msg_meta["id"] for msg_meta in response.get("messages", [])]
+            if message_ids:
+                yield message_ids
+            if remaining is not None:
+                remaining -= len(message_ids)
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+    def _batch_get_messages(self, message_ids: list[str]) -> dict[str, dict]:
+        requests = {
+            message_id: self.service.users().messages().get(userId="me", id=message_id) for message_id in message_ids
+        }
+        return self._execute_batch(requests, QUOTA_UNITS["messages.get"])
+
+    def _prefetch_attachments(self, message_parts: dict[str, tuple[str, list[dict]]]) -> None:
+        """
+        메일들에 포함된 첨부파일을 batch 요청으로 미리 받아 둡니다.
+        받지 못한 첨부파일은 _submit_attachment에서 개별 요청으로 다시 받습니다.
+        """
+        requests = {}
+        for message_id, (_, attachment_parts) in message_parts.items():
+            for part in attachment_parts:
+                att_id = part["body"]["attachmentId"]
+                requests[att_id] = (
+                    self.service.users().messages().attachments().get(userId="me", messageId=message_id, id=att_id)
+                )
+        results = self._execute_batch(requests, QUOTA_UNITS["messages.attachments.get"])
+        self._prefetched_attachments.update({att_id: att["data"] for att_id, att in results.items()})
+
+    def _execute_batch(self, requests: dict, quota_units: int) -> dict[str, dict]:
+        """
+        요청들을 batch_size 단위로 묶어 실행합니다.
+        사용자 당 초당 quota를 넘지 않도록 batch 사이에 대기하고,
+        rate limit에 걸린 요청은 지수 백오프로 재시도합니다.
+
+        Args:
+            requests (dict): request id -> HttpRequest
+            quota_units (int): 요청 하나가 소모하는 quota unit
+
+        Returns:
+            dict: request id -> 응답
+        """
+        results: dict[str, dict] = {}
+        pending = dict(requests)
+        wait_time = 1
+
+        for attempt in range(self.max_retry):
+            if not pending:
+                break
+            rate_limited = {}
+            request_ids = list(pending)
+            for start in range(0, len(request_ids), self.batch_size):
+                chunk = request_ids[start : start + self.batch_size]
+                started_at = time.monotonic()
+
+                def callback(request_id, response, exception):
+                    if exception is None:
+                        results[request_id] = response
+                    elif _is_rate_limit_error(exception):
+                        rate_limited[request_id] = pending[request_id]
+                    else:
+                        logging.warning(f"Failed to fetch {request_id}: {exception}")
+
+                batch = self.service.new_batch_http_request(callback=callback)
+                for request_id in chunk:
+                    batch.add(pending[request_id], request_id=request_id)
+                batch.execute()
+
+                self._pace(len(chunk) * quota_units, started_at)
+
+            pending = rate_limited
+            if pending and attempt < self.max_retry - 1:
+                print(f"[RateLimit] Gmail 요청 {len(pending)}건 재시도 {attempt + 1}/{self.max_retry}회")
+                time.sleep(wait_time)
+                wait_time *= 2
+
+        for request_id in pending:
+            logging.warning(f"Failed to fetch {request_id}: rate limit exceeded after {self.max_retry} retries")
+        return results
+
+    def _pace(self, used_units: int, started_at: float) -> None:
+        # 사용한 quota unit 만큼의 시간이 지나기 전에는 다음 batch를 보내지 않는다
+        min_duration = used_units / self.quota_units_per_second
+        elapsed = time.monotonic() - started_at
+        if elapsed < min_duration:
+            time.sleep(min_duration - elapsed)
+
+    def _process_message(self, body: str, attachment_futures: list[Future]):
+        # 첨부파일 파싱 결과를 본문에 등장한 순서대로 모은다 (replace_image_pattern_with가 순서에 의존)
+        files = deque(future.result() for future in attachment_futures)
 
-        # 여기서는 그냥 body, filenames만 리턴하도록 예시
-        replaced_body, attachments = replace_image_pattern_with(body, filenames)
-        replaced_body = replace_url_pattern_from(replaced_body)
+        replaced_body, attachments = replace_image_pattern_with(body, files)
+        replaced_body = replace_url_pattern_from(replaced_body, self.image_fetcher, self.image_filter)
         return replaced_body, attachments
 
     def _process_headers(self, message):
@@ -68,35 +344,39 @@ class GmailService:
             "date": next((item["value"] for item in headers if item["name"] == "Date"), None),
         }
 
-    def _process_message_part(self, message_id: str, part: dict, files: deque = None):
-        if files is None:
-            files = deque()
+    def _process_message_part(self, part: dict, attachment_parts: list = None) -> tuple[str, list[dict]]:
+        """
+        메일 본문(text/plain)을 추출하고, 첨부파일 part는 등장 순서대로 모아 반환합니다.
+        첨부파일의 다운로드와 파싱은 _submit_attachment에서 따로 수행합니다.
+        """
+        if attachment_parts is None:
+            attachment_parts = []
 
         mime_type = part["mimeType"]
         body_data = part.get("body", {}).get("data")
 
         if mime_type == "text/plain" and body_data:
             decoded_bytes = decode_base64(body_data)
-            return decoded_bytes.decode("utf-8", errors="replace"), files
+            return decoded_bytes.decode("utf-8", errors="replace"), attachment_parts
 
         if part.get("filename"):  # 첨부파일 처리
-            files = self._process_attachment(message_id, part, files)
-            return "", files
+            attachment_parts.append(part)
+            return "", attachment_parts
 
         # multipart
         plain_text = ""
         if "multipart" in mime_type:
             for sub_part in part.get("parts", []):
-                text, files = self._process_message_part(message_id, sub_part, files)
+                text, attachment_parts = self._process_message_part(sub_part, attachment_parts)
                 plain_text += text
 
-        return plain_text, files
+        return plain_text, attachment_parts
 
-    def _process_attachment(self, message_id, part, files, save_dir="downloaded_files"):
+    def _submit_attachment(self, executor: ThreadPoolExecutor, message_id: str, part: dict) -> Future:
         att_id = part["body"]["attachmentId"]
-        att = self.service.users().messages().attachments().get(userId="me", messageId=message_id, id=att_id).execute()
-        saved_file_path = save_file(decode_base64(att["data"]), part["filename"], save_dir=save_dir)
-        if saved_file_path:  # 파일이 정상적으로 저장된 경우
-            files.append(parse_document(saved_file_path))
-            delete_file(saved_file_path)
-        return files
+        data = self._prefetched_attachments.pop(att_id, None)
+        if data is None:
+            # Gmail API 클라이언트는 thread-safe 하지 않으므로 다운로드는 호출한 스레드에서 수행
+            att = self.service.users().messages().attachments().get(userId="me", messageId=message_id, id=att_id)
+            data = att.execute()["data"]
+        return executor.submit(parse_base64_data, data, part["filename"], self.attachment_spool_size, self.image_filter)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class FetchedImage(NamedTuple):
+    file_name: str
+    data: bytes
+
+
+class ImageTooLargeError(Exception):
+    pass
+
+
+class ImageFetcher:
+    """
+    메일 본문에 링크된 이미지를 내려받는 클래스입니다.
+
+    - 하나의 Session(connection pool)을 공유하여 연결을 재사용합니다.
+    - 여러 이미지를 동시에 내려받되, 호스트 별 동시 요청 수를 제한합니다.
+    - HEAD 요청의 Content-Type/Content-Length로 이미지가 아니거나 너무 큰 링크는 본문을 받지 않고,
+      본문을 받는 중에도 max_bytes를 넘으면 중단합니다.
+    - ETag/Last-Modified를 디스크에 저장해 두고 조건부 요청으로 같은 이미지를 다시 받지 않습니다.
+
+    Args:
+        max_workers (int): 동시에 내려받을 최대 이미지 수
+        per_host_limit (int): 호스트 별 최대 동시 요청 수
+        max_bytes (int): 내려받을 이미지의 최대 크기(bytes)
+        timeout (float): 요청 timeout(초)
+        cache_dir (str, optional): 조건부 요청용 캐시 디렉토리, None이면 캐시를 사용하지 않음
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host_limit: int = 4,
+        max_bytes: int = 5 * 1024 * 1024,
+        timeout: float = 10,
+        cache_dir: Optional[str] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_lock = threading.Lock()
+        self._host_semaphores = defaultdict(lambda: threading.Semaphore(per_host_limit))
+
+    def fetch_all(self, urls: list[str]) -> dict[str, FetchedImage]:
+        """
+        여러 이미지 링크를 동시에 내려받습니다.
+
+        Returns:
+            dict: url -> FetchedImage (이미지가 아니거나 실패한 링크는 제외)
+        """
+        urls = [url for url in dict.fromkeys(urls) if url.startswith(("http://", "https://"))]
+        if not urls:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            images = executor.map(self._fetch_safely, urls)
+            return {url: image for url, image in zip(urls, images) if image is not None}
+
+    def fetch(self, url: str) -> Optional[FetchedImage]:
+        with self._get_host_semaphore(url):
+            cached_meta, cached_data = self._load_cache(url)
+
+            if cached_meta is None and not self._pass_head_gate(url):
+                return None
+
+            headers = {}
+            if cached_meta is not None:
+                if cached_meta.get("etag"):
+                    headers["If-None-Match"] = cached_meta["etag"]
+                if cached_meta.get("last_modified"):
+                    headers["If-Modified-Since"] = cached_meta["last_modified"]
+
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and cached_meta is not None:
+                    return FetchedImage(cached_meta["file_name"], cached_data)
+                response.raise_for_status()
+
+                content_type = response.headers.get("Content-Type", "")
+                if "image" not in content_type:
+                    return None
+
+                file_name = self._make_file_name(url, content_type)
+                data = self._read_limited(response)
+                self._save_cache(url, response.headers, file_name, data)
+
+        return FetchedImage(file_name, data)
+
+    def _fetch_safely(self, url: str) -> Optional[FetchedImage]:
+        try:
+            return self.fetch(url)
+        except Exception as e:
+            logging.warning(f"Failed to process {url}: {e}")
+            return None
+
+    def _get_host_semaphore(self, url: str) -> threading.Semaphore:
+        with self._host_lock:
+            return self._host_semaphores[urlparse(url).netloc]
+
+    def _pass_head_gate(self, url: str) -> bool:
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException:
+            return True  # HEAD를 지원하지 않는 서버는 GET 단계에서 판단
+        if response.status_code >= 400:
+            return True
+
+        content_type = response.headers.get("Content-Type")
+        if content_type and "image" not in content_type:
+            return False
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            logging.warning(f"Skipped {url}: {content_length} bytes exceeds {self.max_bytes} bytes")
+            return False
+        return True
+
+    def _read_limited(self, response: requests.Response) -> bytes:
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ImageTooLargeError(f"image exceeds {self.max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @staticmethod
+    def _make_file_name(url: str, content_type: str) -> str:
+        file_extension = content_type.split("/")[-1].split(";")[0]
+        file_name = url.split("/")[-1].split("?")[0]
+        if not file_name.endswith(file_extension):
+            file_name += f".{file_extension}"
+        return file_name
+
+    # 조건부 요청용 디스크 캐시
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _load_cache(self, url: str) -> tuple[Optional[dict], Optional[bytes]]:
+        if not self.cache_dir:
+            return None, None
+        path = self._cache_path(url)
+        try:
+            with open(f"{path}.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(f"{path}.bin", "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _save_cache(self, url: str, headers, file_name: str, data: bytes) -> None:
+        if not self.cache_dir:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return  # 검증할 수 없는 응답은 저장하지 않는다
+
+        path = self._cache_path(url)
+        with open(f"{path}.bin", "wb") as f:
+            f.write(data)
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump({"file_name": file_name, "etag": etag, "last_modified": last_modified}, f)
@@ -0,0 +1,181 @@
+import os
+import struct
+import threading
+from collections import Counter
+from typing import BinaryIO, Optional
+from urllib.parse import urlparse
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 perceptual hash 검사만 건너뛴다
+    Image = None
+
+IMAGE_EXTENSIONS = {"jpeg", "jpg", "png", "gif", "bmp", "webp", "tiff", "heic"}
+HEADER_SIZE = 64 * 1024  # 크기 정보를 찾기 위해 읽을 최대 header 길이
+
+
+def read_image_size(header: bytes) -> Optional[tuple[int, int]]:
+    """
+    이미지 파일의 header만 읽어 (가로, 세로) 픽셀 크기를 반환합니다.
+    PNG, GIF, BMP, WEBP, JPEG를 지원하며, 알 수 없는 형식이면 None을 반환합니다.
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and len(header) >= 24:
+        return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a") and len(header) >= 10:
+        return struct.unpack("<HH", header[6:10])
+    if header.startswith(b"BM") and len(header) >= 26:
+        width, height = struct.unpack("<ii", header[18:26])
+        return abs(width), abs(height)
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP" and len(header) >= 30:
+        chunk = header[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", header[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(header[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+    if header.startswith(b"\xff\xd8"):
+        return _read_jpeg_size(header)
+    return None
+
+
+def _read_jpeg_size(header: bytes) -> Optional[tuple[int, int]]:
+    idx = 2
+    while idx + 9 < len(header):
+        if header[idx] != 0xFF:
+            idx += 1
+            continue
+        marker = header[idx + 1]
+        # SOF0 ~ SOF15 (DHT, JPG, DAC 제외) segment에 크기 정보가 있다
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", header[idx + 5 : idx + 9])
+            return width, height
+        segment_length = struct.unpack(">H", header[idx + 2 : idx + 4])[0]
+        idx += 2 + segment_length
+    return None
+
+
+def difference_hash(buffer: BinaryIO, hash_size: int = 8) -> Optional[int]:
+    """이미지의 dHash(perceptual hash)를 계산합니다. Pillow가 없거나 디코딩할 수 없으면 None을 반환합니다."""
+    if Image is None:
+        return None
+    try:
+        buffer.seek(0)
+        with Image.open(buffer) as image:
+            pixels = list(image.convert("L").resize((hash_size + 1, hash_size)).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class TrivialImageFilter:
+    """
+    추적 픽셀, 여백용 GIF, SNS 아이콘, 서명 로고 등 내용이 없는 이미지를
+    Upstage Document Parse에 보내기 전에 걸러냅니다. 추적 픽셀 호스트는 이미지를 내려받기 전에 걸러냅니다.
+    걸러진 이미지 수는 필터 인스턴스(사용자) 별로 skipped에 사유 별로 집계됩니다.
+
+    Args:
+        min_bytes (int): 이보다 작은 이미지는 제외
+        min_width (int): 가로 픽셀이 이보다 작으면 제외
+        min_height (int): 세로 픽셀이 이보다 작으면 제외
+        max_aspect_ratio (float): 가로세로 비(긴 변/짧은 변)가 이보다 크면 구분선으로 보고 제외
+        tracker_hosts (list[str]): 추적 픽셀을 제공하는 호스트 (하위 도메인 포함)
+        phash_blocklist (list[str]): 제외할 이미지의 dHash 값(16진수)
+        phash_max_distance (int): dHash 해밍 거리가 이 값 이하이면 같은 이미지로 판단
+    """
+
+    def __init__(
+        self,
+        min_bytes: int = 0,
+        min_width: int = 0,
+        min_height: int = 0,
+        max_aspect_ratio: Optional[float] = None,
+        tracker_hosts: Optional[list[str]] = None,
+        phash_blocklist: Optional[list[str]] = None,
+        phash_max_distance: int = 0,
+    ):
+        self.min_bytes = min_bytes
+        self.min_width = min_width
+        self.min_height = min_height
+        self.max_aspect_ratio = max_aspect_ratio
+        self.tracker_hosts = [host.lower() for host in tracker_hosts or []]
+        self.phash_blocklist = [int(value, 16) for value in phash_blocklist or []]
+        self.phash_max_distance = phash_max_distance
+        self.skipped: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, filter_config: dict) -> Optional["TrivialImageFilter"]:
+        if not filter_config or not filter_config.get("enabled"):
+            return None
+        return cls(
+            min_bytes=filter_config.get("min_bytes", 0),
+            min_width=filter_config.get("min_width", 0),
+            min_height=filter_config.get("min_height", 0),
+            max_aspect_ratio=filter_config.get("max_aspect_ratio"),
+            tracker_hosts=filter_config.get("tracker_hosts"),
+            phash_blocklist=filter_config.get("phash_blocklist"),
+            phash_max_distance=filter_config.get("phash_max_distance", 0),
+        )
+
+    def is_tracker_url(self, url: str) -> bool:
+        """이미지 링크가 추적 픽셀 호스트를 가리키는지 판단합니다. 링크를 요청하기 전에 사용합니다."""
+        host = (urlparse(url).hostname or "").lower()
+        if not any(host == tracker or host.endswith(f".{tracker}") for tracker in self.tracker_hosts):
+            return False
+        self._record("tracker_host")
+        return True
+
+    def check(self, buffer: BinaryIO, file_name: str) -> Optional[str]:
+        """
+        파싱할 가치가 없는 이미지인지 판단합니다.
+
+        Returns:
+            Optional[str]: 제외 사유, 파싱해야 하는 이미지라면 None
+        """
+        reason = self._find_reason(buffer, file_name)
+        if reason is not None:
+            self._record(reason)
+        buffer.seek(0)
+        return reason
+
+    def get_total_skipped(self) -> int:
+        return sum(self.skipped.values())
+
+    def _record(self, reason: str) -> None:
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def _find_reason(self, buffer: BinaryIO, file_name: str) -> Optional[str]:
+        if os.path.splitext(file_name)[1][1:].lower() not in IMAGE_EXTENSIONS:
+            return None
+
+        buffer.seek(0, os.SEEK_END)
+        if buffer.tell() < self.min_bytes:
+            return "too_small_bytes"
+
+        buffer.seek(0)
+        size = read_image_size(buffer.read(HEADER_SIZE))
+        if size is not None:
+            width, height = size
+            if width < self.min_width or height < self.min_height:
+                return "too_small_pixels"
+            if self.max_aspect_ratio and max(width, height) > self.max_aspect_ratio * max(min(width, height), 1):
+                return "extreme_aspect_ratio"
+
+        if self.phash_blocklist:
+            image_hash = difference_hash(buffer)
+            if image_hash is not None and any(
+                bin(image_hash ^ blocked).count("1") <= self.phash_max_distance for blocked in self.phash_blocklist
+            ):
+                return "phash_blocklist"
+        return None
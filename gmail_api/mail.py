@@ -1,39 +1,117 @@
+import hashlib
+from typing import Optional
+
+
 class Mail:
+    """
+    메일 한 통을 나타내는 불변 객체입니다.
+    LLM 프롬프트에 들어갈 문자열(str(mail))은 처음 요청될 때 한 번만 만들고 이후에는 캐시된 값을 반환합니다.
+    값을 바꿔야 할 때는 replace()로 새 객체를 만듭니다.
+    """
+
+    __slots__ = (
+        "message_id",
+        "id",
+        "sender",
+        "recipients",
+        "subject",
+        "body",
+        "cc",
+        "attachments",
+        "date",
+        "_text",
+        "_hash",
+    )
+
     def __init__(
         self,
         message_id: str,
         mail_id: str,
         body: str,
-        attachments: list[str],
+        attachments: Optional[list[str]],
         headers: dict[str, str],
     ):
         """
         Args:
-            gmail_service: GmailService (이미 인증된 Gmail API 서비스 객체 래퍼)
             message_id (str): Gmail 상에서의 message id
             mail_id (str): 우리 서비스 내에서 매길 임의 id
+            body (str): 메일 본문
+            attachments (list[str], optional): 파싱된 첨부파일 내용
+            headers (dict[str, str]): sender, recipients, cc, subject, date
         """
-        self.message_id = message_id
-        self.id = mail_id
-        self.sender = headers["sender"]
-        self.recipients = [headers["recipients"]]
-        self.subject = headers["subject"]
-        self.body = body
-        self.cc = [headers["cc"]] if headers["cc"] is not None else []
-        self.attachments = attachments if attachments is not None else []
-        self.date = headers["date"]
+        self._init(
+            message_id=message_id,
+            id=mail_id,
+            sender=headers["sender"],
+            recipients=(headers["recipients"],),
+            subject=headers["subject"],
+            body=body,
+            cc=(headers["cc"],) if headers["cc"] is not None else (),
+            attachments=tuple(attachments) if attachments is not None else (),
+            date=headers["date"],
+        )
+
+    def _init(self, **fields) -> None:
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_text", None)
+        object.__setattr__(self, "_hash", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Mail is immutable, use replace() instead of setting '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Mail is immutable, cannot delete '{name}'")
+
+    # __setattr__를 막았으므로 copy, pickle이 상태를 복원할 때는 object.__setattr__를 사용한다
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def replace(self, **changes) -> "Mail":
+        """
+        일부 필드만 바꾼 새 Mail을 반환합니다. (예: mail.replace(body=new_body))
+        recipients, cc, attachments는 list/tuple 모두 받을 수 있습니다.
+        """
+        fields = {name: getattr(self, name) for name in self.__slots__ if not name.startswith("_")}
+        unknown = set(changes) - set(fields)
+        if unknown:
+            raise TypeError(f"Unknown Mail fields: {', '.join(sorted(unknown))}")
+        fields.update(changes)
+        for name in ("recipients", "cc", "attachments"):
+            fields[name] = tuple(fields[name])
+
+        mail = object.__new__(Mail)
+        mail._init(**fields)
+        return mail
+
+    @property
+    def content_hash(self) -> str:
+        """
+        프롬프트에 들어가는 내용(헤더, 본문, 첨부파일)의 sha256 해시입니다.
+        message_id, id와 무관하므로 같은 내용의 메일은 같은 값을 가지며, 캐시 키로 사용할 수 있습니다.
+        """
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hashlib.sha256(str(self).encode("utf-8")).hexdigest())
+        return self._hash
 
     def __str__(self) -> str:
-        attachments_text = ""
-        if self.attachments:
-            for i, item in enumerate(self.attachments):
-                attachments_text += f"첨부파일 {i + 1}:\n{item}\n\n"
-        return (
-            f"보낸 사람: {self.sender}\n"
-            f"받는 사람: {', '.join(self.recipients)}\n"
-            f"참조: {', '.join(self.cc)}\n"
-            f"제목: {self.subject}\n"
-            f"날짜: {self.date}\n"
-            f"본문:\n{self.body}\n"
-            f"{attachments_text}"
-        )
+        if self._text is None:
+            attachments_text = "".join(f"첨부파일 {i + 1}:\n{item}\n\n" for i, item in enumerate(self.attachments))
+            text = (
+                f"보낸 사람: {self.sender}\n"
+                f"받는 사람: {', '.join(self.recipients)}\n"
+                f"참조: {', '.join(self.cc)}\n"
+                f"제목: {self.subject}\n"
+                f"날짜: {self.date}\n"
+                f"본문:\n{self.body}\n"
+                f"{attachments_text}"
+            )
+            object.__setattr__(self, "_text", text)
+        return self._text
+
+    def __repr__(self) -> str:
+        return f"Mail(message_id={self.message_id!r}, id={self.id!r}, subject={self.subject!r})"
@@ -0,0 +1,115 @@
+import re
+from email.utils import parseaddr
+
+# Gmail 카테고리 라벨 -> 검색 연산자
+CATEGORY_QUERIES = {
+    "CATEGORY_PERSONAL": "category:primary",
+    "CATEGORY_SOCIAL": "category:social",
+    "CATEGORY_PROMOTIONS": "category:promotions",
+    "CATEGORY_UPDATES": "category:updates",
+    "CATEGORY_FORUMS": "category:forums",
+}
+
+
+class MailMetadata:
+    """
+    format=metadata로 받은 메일에서 필터링에 필요한 정보만 추린 객체입니다.
+
+    Args:
+        message (dict): users.messages.get(format="metadata") 응답
+    """
+
+    def __init__(self, message: dict):
+        headers = message.get("payload", {}).get("headers", [])
+        self.message_id: str = message["id"]
+        self.subject: str = next((item["value"] for item in headers if item["name"] == "Subject"), "")
+        self.sender: str = next((item["value"] for item in headers if item["name"] == "From"), "")
+        self.label_ids: list[str] = message.get("labelIds", [])
+        self.size_estimate: int = message.get("sizeEstimate", 0)
+
+    @property
+    def sender_address(self) -> str:
+        return parseaddr(self.sender)[1].lower()
+
+
+class MailFilter:
+    """
+    메일 필터의 기본 클래스입니다.
+    query()는 Gmail 검색 쿼리(q=)로 미리 걸러낼 수 있는 조건을,
+    accept()는 메타데이터를 받은 뒤 로컬에서 판단할 조건을 구현합니다.
+    """
+
+    def query(self) -> str:
+        return ""
+
+    def accept(self, metadata: MailMetadata) -> bool:
+        return True
+
+
+class SubjectPatternFilter(MailFilter):
+    """제목이 정규식 패턴 중 하나라도 포함하면 제외합니다. (Gmail 검색은 정규식을 지원하지 않아 로컬에서만 판단)"""
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+
+    def accept(self, metadata: MailMetadata) -> bool:
+        return not any(pattern.search(metadata.subject) for pattern in self.patterns)
+
+
+class LabelFilter(MailFilter):
+    """지정한 라벨(예: CATEGORY_PROMOTIONS)이 붙은 메일을 제외합니다."""
+
+    def __init__(self, exclude_labels: list[str]):
+        self.exclude_labels = set(exclude_labels)
+
+    def query(self) -> str:
+        return " ".join(
+            f"-{CATEGORY_QUERIES[label]}" if label in CATEGORY_QUERIES else f"-label:{label}"
+            for label in sorted(self.exclude_labels)
+        )
+
+    def accept(self, metadata: MailMetadata) -> bool:
+        return not self.exclude_labels.intersection(metadata.label_ids)
+
+
+class SenderBlocklistFilter(MailFilter):
+    """발신자 주소 혹은 도메인(@로 시작)이 차단 목록에 있으면 제외합니다."""
+
+    def __init__(self, blocklist: list[str]):
+        self.blocklist = [sender.lower() for sender in blocklist]
+
+    def query(self) -> str:
+        return " ".join(f"-from:{sender}" for sender in self.blocklist)
+
+    def accept(self, metadata: MailMetadata) -> bool:
+        address = metadata.sender_address
+        return not any(
+            address.endswith(sender) if sender.startswith("@") else address == sender for sender in self.blocklist
+        )
+
+
+class MailFilterChain:
+    """
+    여러 MailFilter를 순서대로 적용합니다.
+    모든 필터의 query()를 검색 쿼리에 합치고, 모든 필터의 accept()를 통과한 메일만 남깁니다.
+    """
+
+    def __init__(self, filters: list[MailFilter]):
+        self.filters = filters
+
+    @classmethod
+    def from_config(cls, filter_config: dict) -> "MailFilterChain":
+        filter_config = filter_config or {}
+        return cls(
+            [
+                SubjectPatternFilter(filter_config.get("subject_patterns") or []),
+                LabelFilter(filter_config.get("exclude_labels") or []),
+                SenderBlocklistFilter(filter_config.get("sender_blocklist") or []),
+            ]
+        )
+
+    def query(self) -> str:
+        return " ".join(query for query in (mail_filter.query() for mail_filter in self.filters) if query)
+
+    def accept(self, metadata: MailMetadata) -> bool:
+        return all(mail_filter.accept(metadata) for mail_filter in self.filters)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils.configuration import Config
+
+# 파서(모델, 출력 형식)가 바뀌면 버전을 올려 이전 캐시를 무효화한다
+PARSER_VERSION = "upstage-document-parse:html:v1"
+
+
+class ParsedDocumentCache:
+    """
+    Upstage Document Parse 결과를 첨부파일 내용의 해시로 저장하는 영구 캐시입니다.
+    같은 첨부파일(주간 양식, 서명 로고 등)이 반복해서 도착해도 파싱 비용을 한 번만 지불합니다.
+    전체 크기가 max_size_mb를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다(LRU).
+    """
+
+    hits: int = 0
+    misses: int = 0
+    _connection: Optional[sqlite3.Connection] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return Config.config["parse_cache"]["enabled"]
+
+    @staticmethod
+    def new_hasher():
+        """파일 내용을 나눠서 update할 수 있도록 파서 버전이 반영된 해시 객체를 반환합니다."""
+        return hashlib.sha256(PARSER_VERSION.encode("utf-8") + b"\0")
+
+    @classmethod
+    def make_key(cls, file_data: bytes) -> str:
+        hasher = cls.new_hasher()
+        hasher.update(file_data)
+        return hasher.hexdigest()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[str]:
+        with cls._lock:
+            connection = cls._connect()
+            row = connection.execute("SELECT content FROM parsed_documents WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                cls.misses += 1
+                return None
+            connection.execute("UPDATE parsed_documents SET last_access = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+            cls.hits += 1
+            return row[0]
+
+    @classmethod
+    def put(cls, key: str, content: str) -> None:
+        with cls._lock:
+            connection = cls._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO parsed_documents (key, content, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, content, len(content.encode("utf-8")), time.time()),
+            )
+            cls._evict(connection)
+            connection.commit()
+
+    @classmethod
+    def get_stats(cls) -> dict[str, int]:
+        return {"hits": cls.hits, "misses": cls.misses}
+
+    @classmethod
+    def reset_stats(cls) -> None:
+        with cls._lock:
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def _connect(cls) -> sqlite3.Connection:
+        if cls._connection is None:
+            path = Config.config["parse_cache"]["path"]
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # 첨부파일 파싱 스레드들이 함께 사용하므로 _lock으로 접근을 직렬화한다
+            cls._connection = sqlite3.connect(path, check_same_thread=False)
+            cls._connection.execute(
+                "CREATE TABLE IF NOT EXISTS parsed_documents "
+                "(key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+        return cls._connection
+
+    @classmethod
+    def _evict(cls, connection: sqlite3.Connection) -> None:
+        max_size = Config.config["parse_cache"]["max_size_mb"] * 1024 * 1024
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM parsed_documents").fetchone()[0]
+        if total_size <= max_size:
+            return
+
+        rows = connection.execute("SELECT key, size FROM parsed_documents ORDER BY last_access").fetchall()
+        evicted_keys = []
+        for key, size in rows:
+            if total_size <= max_size:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+        connection.executemany("DELETE FROM parsed_documents WHERE key = ?", evicted_keys)
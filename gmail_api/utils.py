@@ -1,15 +1,25 @@
 import base64
+import io
 import logging
 import os
 import re
+import tempfile
 from collections import deque
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
 
 import requests
-from langchain_upstage import UpstageDocumentParseLoader
+
+from gmail_api.image_fetcher import ImageFetcher
+from gmail_api.image_filter import TrivialImageFilter
+from gmail_api.parse_cache import ParsedDocumentCache
+from utils.configuration import Config
 
 logging.basicConfig(level=logging.WARNING, filename="gmail_api/gmail_error.log")
 
+DEFAULT_SPOOL_SIZE = 10 * 1024 * 1024  # 이보다 큰 첨부파일은 임시 파일로 내려 처리
+BASE64_CHUNK_SIZE = 4 * 256 * 1024  # 4의 배수여야 청크 단위로 디코딩할 수 있다
+
 
 def is_supported_format(file_path: str) -> bool:
     supported_formats = ["jpeg", "png", "bmp", "pdf", "tiff", "heic", "docx", "pptx", "xlsx"]
@@ -18,18 +28,116 @@ def is_supported_format(file_path: str) -> bool:
     return file_extension in supported_formats
 
 
-def parse_document(file_path) -> str:
-    if is_supported_format(file_path):
-        loader = UpstageDocumentParseLoader(file_path)
-        pages = loader.load()
-
-        parsed_document = ""
-        for page in pages:
-            parsed_document += page.page_content
-        return parsed_document
-    else:
+def request_document_parse(document: BinaryIO, file_name: str) -> str:
+    """
+    파일 객체를 디스크에 저장하지 않고 Upstage Document Parse API로 보내 파싱합니다.
+    주소와 요청 옵션은 config의 document_parse를 사용합니다.
+
+    API 요청/응답 형식:
+        - 요청: POST multipart/form-data, "document" 필드에 파일, 나머지 필드는 document_parse.options
+        - 인증: Authorization: Bearer {사용자의 Upstage API 키}
+        - 응답: {"elements": [{"content": {"html": ...}}, ...]}
+          output_formats가 html이면 모든 element의 html을 순서대로 이은 문자열을 반환합니다.
+          (UpstageDocumentParseLoader의 기본 설정인 split 없음과 같은 결과)
+
+    Raises:
+        requests.HTTPError: API가 오류 상태 코드를 반환한 경우
+    """
+    document_parse_config = Config.config["document_parse"]
+    api_key = Config.user_upstage_api_key or os.getenv("UPSTAGE_API_KEY")
+    response = requests.post(
+        document_parse_config["url"],
+        headers={"Authorization": f"Bearer {api_key}"},
+        files={"document": (os.path.basename(file_name), document)},
+        data=document_parse_config["options"],
+        timeout=document_parse_config["timeout"],
+    )
+    response.raise_for_status()
+    elements = response.json().get("elements", [])
+    return "".join(element["content"]["html"] for element in elements)
+
+
+def parse_buffer(
+    buffer: BinaryIO,
+    file_name: str,
+    cache_key: Optional[str] = None,
+    image_filter: Optional[TrivialImageFilter] = None,
+) -> str:
+    """
+    버퍼에 담긴 파일을 파싱합니다. 같은 내용의 파일을 이미 파싱한 적이 있다면 캐시된 결과를 반환합니다.
+
+    Args:
+        buffer (BinaryIO): 파일 내용이 담긴 버퍼
+        file_name (str): 파일명 (확장자로 지원 형식 여부를 판단)
+        cache_key (str, optional): ParsedDocumentCache 키, 없으면 캐시를 사용하지 않음
+        image_filter (TrivialImageFilter, optional): 파싱하지 않고 버릴 이미지를 판단하는 필터
+
+    Returns:
+        str: 파싱 결과, 필터에 걸린 이미지는 빈 문자열
+    """
+    if not is_supported_format(file_name):
         # 지원되지 않는 형식일 경우 파일명만 반환
-        return f"{os.path.basename(file_path)}"
+        return os.path.basename(file_name)
+
+    if image_filter is not None and image_filter.check(buffer, file_name) is not None:
+        return ""
+
+    use_cache = ParsedDocumentCache.is_enabled() and cache_key is not None
+    if use_cache:
+        cached = ParsedDocumentCache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    buffer.seek(0)
+    parsed_document = request_document_parse(buffer, file_name)
+
+    if use_cache:
+        ParsedDocumentCache.put(cache_key, parsed_document)
+    return parsed_document
+
+
+def parse_file_data(
+    file_data: bytes,
+    file_name: str,
+    image_filter: Optional[TrivialImageFilter] = None,
+) -> str:
+    return parse_buffer(io.BytesIO(file_data), file_name, ParsedDocumentCache.make_key(file_data), image_filter)
+
+
+def parse_base64_data(
+    data: str,
+    file_name: str,
+    spool_size: int = DEFAULT_SPOOL_SIZE,
+    image_filter: Optional[TrivialImageFilter] = None,
+) -> str:
+    """
+    Gmail API의 urlsafe base64 첨부파일 데이터를 디스크에 저장하지 않고 파싱합니다.
+    spool_size보다 큰 파일만 고유한 임시 파일로 내려 처리합니다.
+    """
+    if not is_supported_format(file_name):
+        return os.path.basename(file_name)
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_size) as buffer:
+        cache_key = decode_base64_stream(data, buffer)
+        return parse_buffer(buffer, file_name, cache_key, image_filter)
+
+
+def decode_base64_stream(data: str, output: BinaryIO, chunk_size: int = BASE64_CHUNK_SIZE) -> str:
+    """
+    urlsafe base64 문자열을 청크 단위로 디코딩하여 output에 씁니다.
+    디코딩된 전체 bytes를 한 번에 메모리에 올리지 않으며, 동시에 ParsedDocumentCache 키를 계산합니다.
+
+    Returns:
+        str: 디코딩된 내용의 ParsedDocumentCache 키
+    """
+    hasher = ParsedDocumentCache.new_hasher()
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start : start + chunk_size]
+        # 마지막 청크는 padding이 생략되어 있을 수 있다
+        decoded = base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4))
+        hasher.update(decoded)
+        output.write(decoded)
+    return hasher.hexdigest()
 
 
 def decode_base64(data: str) -> bytes:
@@ -37,31 +145,6 @@ def decode_base64(data: str) -> bytes:
     return base64.b64decode(data)
 
 
-def save_file(file_data: bytes, file_name: str, save_dir: str = "downloaded_files") -> Optional[str]:
-    try:
-        os.makedirs(save_dir, exist_ok=True)
-        file_path = os.path.join(save_dir, file_name)
-        with open(file_path, "wb") as file:
-            file.write(file_data)
-        return file_path
-    except Exception as e:
-        print(f"An error occurred while saving the file: {e}")
-        return None
-
-
-def delete_file(saved_file_path: str) -> bool:
-    try:
-        if os.path.exists(saved_file_path):
-            os.remove(saved_file_path)
-            return True
-        else:
-            print(f"The file does not exist: {saved_file_path}")
-            return False
-    except Exception as e:
-        print(f"An error occurred while deleting the file: {e}")
-        return False
-
-
 def replace_pattern_with(parsed_items: dict, text: str, pattern: str) -> str:
     def replacement(match):
         key = match.group(1)
@@ -74,35 +157,46 @@ def remove_http_brackets(text):
     return re.sub(r"<[^>]*http[^>]*>", "", text)
 
 
-def replace_url_pattern_from(plain_text: str) -> str:
+def replace_url_pattern_from(
+    plain_text: str,
+    image_fetcher: Optional[ImageFetcher] = None,
+    image_filter: Optional[TrivialImageFilter] = None,
+) -> str:
+    """
+    본문의 [url] 형태의 이미지 링크를 내려받아 파싱한 결과로 치환합니다.
+    이미지 다운로드와 파싱은 모두 병렬로 수행합니다.
+
+    Args:
+        plain_text (str): 메일 본문
+        image_fetcher (ImageFetcher, optional): 여러 메일에서 공유할 이미지 다운로더
+        image_filter (TrivialImageFilter, optional): 파싱하지 않고 버릴 이미지를 판단하는 필터
+    """
+    if image_fetcher is None:
+        image_fetcher = ImageFetcher()
 
     clean_text = remove_http_brackets(plain_text)
     url_pattern = r"\[([^\]]+)\]"
     urls = re.findall(url_pattern, clean_text)
-    url_to_parsed_image = {}
-
-    for url in urls:
-        try:
-            response = requests.get(url, stream=True, timeout=10)
-            content_type = response.headers.get("Content-Type", "")
-
-            if "image" in content_type:
-                file_extension = content_type.split("/")[-1].split(";")[0]
-                file_name = url.split("/")[-1].split("?")[0]
 
-                if not file_name.endswith(file_extension):
-                    file_name += f".{file_extension}"
-
-                file_data = response.content
-                file_path = save_file(file_data, file_name)
-
-                if file_path:
-                    parsed_image = parse_document(file_path)
-                    url_to_parsed_image[url] = parsed_image
-                    delete_file(file_path)
-            clean_text.replace("url", "")
-        except Exception as e:
-            logging.warning(f"Failed to process {url}: {e}")
+    url_to_parsed_image = {}
+    if image_filter is not None:
+        # 추적 픽셀은 요청하는 것만으로 열람이 기록되므로 내려받기 전에 제외
+        tracker_urls = {url for url in urls if image_filter.is_tracker_url(url)}
+        url_to_parsed_image = {url: "" for url in tracker_urls}
+        urls = [url for url in urls if url not in tracker_urls]
+
+    images = image_fetcher.fetch_all(urls)
+    if images:
+        with ThreadPoolExecutor(max_workers=image_fetcher.max_workers) as executor:
+            futures = {
+                url: executor.submit(parse_file_data, image.data, image.file_name, image_filter)
+                for url, image in images.items()
+            }
+            for url, future in futures.items():
+                try:
+                    url_to_parsed_image[url] = future.result()
+                except Exception as e:
+                    logging.warning(f"Failed to process {url}: {e}")
 
     return replace_pattern_with(url_to_parsed_image, clean_text, url_pattern)
 
@@ -8,6 +8,7 @@ from googleapiclient.discovery import build
 
 from gmail_api.gmail_service import GmailService
 from pipelines.pipeline import pipeline
+from prompt.prompt_registry import PromptRegistry
 from utils.configuration import Config
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
@@ -32,6 +33,7 @@ def create_service():
 def main():
     load_dotenv()
     Config.load()
+    PromptRegistry.load()
 
     Config.user_upstage_api_key = os.getenv("UPSTAGE_API_KEY")
 
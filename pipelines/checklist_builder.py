@@ -1,6 +1,8 @@
 import json
 from collections import defaultdict
 
+from pipelines.cluster_mails import collapse_similar_mails
+
 category_titles = {"academic": "📝 학술/연구", "administration": "🏢 행정 처리", "other": "📂 기타/그 외"}
 action_titles = {"action needed": "📌 처리가 필요한 메일", "read only": "👀 읽어볼 메일"}
 
@@ -16,26 +18,17 @@ def build_json_checklist(
     action_dict: dict[str, str],
     similar_mails_dict: dict[str, list[str]],
 ) -> str:
-    seen_message_ids = set()
     result = defaultdict(lambda: defaultdict(list))
 
-    for mail_id, summary in summary_dict.items():
-        if mail_id in seen_message_ids:
-            continue
-
-        seen_message_ids.add(mail_id)
-        seen_message_ids.update(similar_mails_dict.get(mail_id, []))
-
+    for mail_id, similar_mail_ids in collapse_similar_mails(summary_dict, similar_mails_dict).items():
         category = category_dict.get(mail_id, "other")
         action = action_dict.get(mail_id, "read only")
 
-        links = [f"{GMAIL_URL}{mail_id}"] + [
-            f"{GMAIL_URL}{similar_mail_id}" for similar_mail_id in similar_mails_dict.get(mail_id, [])
-        ]
+        links = [f"{GMAIL_URL}{mail_id}"] + [f"{GMAIL_URL}{similar_mail_id}" for similar_mail_id in similar_mail_ids]
 
         result[category][action].append(
             {
-                "description": summary,
+                "description": summary_dict[mail_id],
                 "links": links,
                 "checked": False,
             }
@@ -1,39 +1,91 @@
 import warnings
 from collections import Counter
+from typing import Callable, Optional
 
+import numpy as np
 import pandas as pd
 
 from agents.classification.classification_agent import ClassificationAgent
 from agents.classification.classification_type import ClassificationType
+from agents.classification.knn_classifier import KnnClassifier
+from agents.embedding.embedding_manager import EmbeddingManager
 from utils.configuration import Config
+from utils.token_usage_counter import TokenUsageCounter
 
 warnings.filterwarnings("ignore", message="A single label was found in 'y_true' and 'y_pred'.*")
 
+# (투표를 받을 메일 ID 목록, 요청할 투표 수, 이미 모은 투표 수) -> 메일 ID -> [{분류 종류 -> 레이블}, ...]
+VoteRequester = Callable[[list[str], int, int], dict[str, list[dict[str, str]]]]
 
-def classify_single_mail(summary_dict: dict[str, str]) -> tuple[dict, dict]:
+
+def classify_single_mail(
+    summary_dict: dict[str, str],
+    embedding_manager: Optional[EmbeddingManager] = None,
+    embedding_vectors: Optional[dict[str, np.ndarray]] = None,
+    user_id: str = "local",
+) -> tuple[dict, dict]:
+    """
+    메일 요약문으로 category와 action을 분류합니다.
+    kNN 분류가 켜져 있고 임베딩 벡터가 주어지면, 이웃 메일들의 레이블이 충분히 일치하는 메일은 LLM 없이 분류합니다.
+    kNN 저장소는 user_id 별로 따로 사용합니다.
+    """
     temperature: int = Config.config["temperature"]["classification"]
     seed: int = Config.config["seed"]
 
     classification_agent = ClassificationAgent("solar-pro", temperature, seed)
 
-    categories_dict = {}
-    actions_dict = {}
-
     iteration = Config.config["classification"]["inference"]
+    batch_size = Config.config["classification"]["batch_size"]
+    joint = Config.config["classification"]["joint"]
+    voting_config = Config.config["classification"]["voting"]
+
+    classification_types = [ClassificationType.CATEGORY, ClassificationType.ACTION]
+
+    knn_classifier, knn_votes = None, {}
+    if Config.config["knn_classification"]["enabled"] and embedding_manager is not None and embedding_vectors:
+        knn_classifier = create_knn_classifier(embedding_manager, classification_types, user_id)
+        knn_votes = classify_with_knn(knn_classifier, embedding_vectors, list(summary_dict))
+    llm_summary_dict = {mail_id: summary for mail_id, summary in summary_dict.items() if mail_id not in knn_votes}
+
+    # 함께 분류할 분류 종류 묶음 (joint가 아니면 분류 종류마다 따로 요청)
+    type_groups = [classification_types] if joint else [[type_] for type_ in classification_types]
 
+    votes_dict = {}
+    for types in type_groups:
+        if batch_size:
+            request_votes = batch_vote_requester(classification_agent, llm_summary_dict, types, batch_size)
+        elif len(types) > 1:
+            request_votes = joint_vote_requester(classification_agent, llm_summary_dict, types)
+        else:
+            request_votes = single_vote_requester(classification_agent, llm_summary_dict, types[0])
+        votes_dict.update(collect_votes(request_votes, list(llm_summary_dict), types, iteration, voting_config))
+
+    if knn_classifier is not None:
+        # LLM으로 분류한 메일만 저장소에 추가 (kNN 결과를 다시 학습하지 않도록)
+        for mail_id in llm_summary_dict:
+            labels = {type_: Counter(votes_dict[type_][mail_id]).most_common(1)[0][0] for type_ in classification_types}
+            knn_classifier.add(mail_id, embedding_vectors[mail_id], labels)
+        knn_classifier.save()
+
+    # summary_dict 순서대로 kNN 결과와 LLM 결과를 합친다
     categories_dict = {
-        mail_id: [
-            classification_agent.process(summary_dict[mail_id], ClassificationType.CATEGORY) for _ in range(iteration)
-        ]
+        mail_id: (
+            knn_votes[mail_id][ClassificationType.CATEGORY]
+            if mail_id in knn_votes
+            else votes_dict[ClassificationType.CATEGORY][mail_id]
+        )
         for mail_id in summary_dict
     }
     actions_dict = {
-        mail_id: [
-            classification_agent.process(summary_dict[mail_id], ClassificationType.ACTION) for _ in range(iteration)
-        ]
+        mail_id: (
+            knn_votes[mail_id][ClassificationType.ACTION]
+            if mail_id in knn_votes
+            else votes_dict[ClassificationType.ACTION][mail_id]
+        )
         for mail_id in summary_dict
     }
 
+    # 조기 종료된 메일은 투표 수가 inference보다 적을 수 있다
     pd.DataFrame(
         {
             "id": list(summary_dict.keys()),
@@ -49,3 +101,159 @@ def classify_single_mail(summary_dict: dict[str, str]) -> tuple[dict, dict]:
     action_dict = {mail_id: Counter(actions).most_common(1)[0][0] for mail_id, actions in actions_dict.items()}
 
     return category_dict, action_dict
+
+
+def create_knn_classifier(
+    embedding_manager: EmbeddingManager, classification_types: list[str], user_id: str
+) -> KnnClassifier:
+    knn_config = Config.config["knn_classification"]
+    return KnnClassifier(
+        embedding_manager,
+        classification_types,
+        store_dir=knn_config["store_dir"],
+        user_id=user_id,
+        seed_path=knn_config["seed_path"],
+        k=knn_config["k"],
+        agreement_threshold=knn_config["agreement_threshold"],
+        min_similarity=knn_config["min_similarity"],
+        max_size=knn_config["max_size"],
+    )
+
+
+def classify_with_knn(
+    knn_classifier: KnnClassifier, embedding_vectors: dict[str, np.ndarray], mail_ids: list[str]
+) -> dict[str, dict[str, list[str]]]:
+    """
+    이웃 메일들의 레이블이 충분히 일치하는 메일을 kNN으로 분류하고, LLM 호출을 생략한 비율을 출력합니다.
+
+    Returns:
+        dict: 메일 ID -> 분류 종류 -> 투표 리스트(kNN 결과 1개)
+    """
+    knn_votes = {}
+    for mail_id in mail_ids:
+        prediction = knn_classifier.predict(embedding_vectors[mail_id], mail_id)
+        TokenUsageCounter.add_cache_lookup("knn_classifier", "classification", prediction is not None)
+        if prediction is not None:
+            knn_votes[mail_id] = {type_: [label] for type_, label in prediction.items()}
+
+    if mail_ids:
+        print(
+            f"[kNN Classification] {len(knn_votes)}/{len(mail_ids)}개 메일을 LLM 없이 분류 "
+            f"(LLM 분류 생략 비율: {len(knn_votes) / len(mail_ids):.1%})"
+        )
+    return knn_votes
+
+
+def collect_votes(
+    request_votes: VoteRequester,
+    mail_ids: list[str],
+    classification_types: list[str],
+    iteration: int,
+    voting_config: dict,
+) -> dict[str, dict[str, list[str]]]:
+    """
+    메일마다 최대 iteration개의 투표를 모읍니다.
+    adaptive 모드에서는 라운드마다 과반이 확정될 수 있는 만큼만 요청하고,
+    모든 분류 종류의 결과가 확정된 메일은 다음 라운드에서 제외합니다.
+
+    Returns:
+        dict: 분류 종류 -> 메일 ID -> 투표 리스트
+    """
+    votes_dict = {type_: {mail_id: [] for mail_id in mail_ids} for type_ in classification_types}
+    pending = list(mail_ids)
+
+    while pending:
+        if voting_config["adaptive"]:
+            round_size = max(
+                _votes_to_decide([votes_dict[type_][mail_id] for type_ in classification_types], iteration)
+                for mail_id in pending
+            )
+        else:
+            round_size = iteration - len(votes_dict[classification_types[0]][pending[0]])
+        vote_offset = len(votes_dict[classification_types[0]][pending[0]])
+
+        for mail_id, votes in request_votes(pending, round_size, vote_offset).items():
+            for vote in votes[: iteration - len(votes_dict[classification_types[0]][mail_id])]:
+                for type_ in classification_types:
+                    votes_dict[type_][mail_id].append(vote[type_])
+
+        pending = [
+            mail_id
+            for mail_id in pending
+            if len(votes_dict[classification_types[0]][mail_id]) < iteration
+            and not (
+                voting_config["adaptive"]
+                and all(
+                    _is_decided(votes_dict[type_][mail_id], iteration, voting_config) for type_ in classification_types
+                )
+            )
+        ]
+
+    return votes_dict
+
+
+def _is_decided(votes: list[str], iteration: int, voting_config: dict) -> bool:
+    """남은 투표가 모두 2위에게 가도 1위가 바뀌지 않거나, 1위 비율이 confidence_threshold 이상이면 확정"""
+    if not votes:
+        return False
+    counts = Counter(votes).most_common(2)
+    leader = counts[0][1]
+    runner_up = counts[1][1] if len(counts) > 1 else 0
+    if leader - runner_up > iteration - len(votes):
+        return True
+    return len(votes) >= voting_config["min_votes"] and leader / len(votes) >= voting_config["confidence_threshold"]
+
+
+def _votes_to_decide(votes_by_type: list[list[str]], iteration: int) -> int:
+    """모든 분류 종류의 1위가 과반을 확보하기 위해 최소한으로 더 필요한 투표 수"""
+    remaining = iteration - len(votes_by_type[0])
+    majority = iteration // 2 + 1
+    needed = max(majority - (Counter(votes).most_common(1)[0][1] if votes else 0) for votes in votes_by_type)
+    return max(1, min(needed, remaining))
+
+
+def single_vote_requester(
+    classification_agent: ClassificationAgent, summary_dict: dict[str, str], classification_type: str
+) -> VoteRequester:
+    def request_votes(mail_ids: list[str], n: int, vote_offset: int) -> dict[str, list[dict[str, str]]]:
+        return {
+            mail_id: [
+                {classification_type: label}
+                for label in classification_agent.sample(summary_dict[mail_id], classification_type, n, vote_offset)
+            ]
+            for mail_id in mail_ids
+        }
+
+    return request_votes
+
+
+def joint_vote_requester(
+    classification_agent: ClassificationAgent, summary_dict: dict[str, str], classification_types: list[str]
+) -> VoteRequester:
+    """메일마다 하나의 요청으로 여러 분류 종류를 함께 분류합니다."""
+
+    def request_votes(mail_ids: list[str], n: int, vote_offset: int) -> dict[str, list[dict[str, str]]]:
+        return {
+            mail_id: classification_agent.sample_joint(summary_dict[mail_id], classification_types, n, vote_offset)
+            for mail_id in mail_ids
+        }
+
+    return request_votes
+
+
+def batch_vote_requester(
+    classification_agent: ClassificationAgent,
+    summary_dict: dict[str, str],
+    classification_types: list[str],
+    batch_size: int,
+) -> VoteRequester:
+    """batch_size개의 메일을 하나의 요청으로 묶어 분류합니다."""
+
+    def request_votes(mail_ids: list[str], n: int, vote_offset: int) -> dict[str, list[dict[str, str]]]:
+        votes_dict = {}
+        for start in range(0, len(mail_ids), batch_size):
+            batch = {mail_id: summary_dict[mail_id] for mail_id in mail_ids[start : start + batch_size]}
+            votes_dict.update(classification_agent.sample_batch(batch, classification_types, n, vote_offset))
+        return votes_dict
+
+    return request_votes
@@ -1,19 +1,51 @@
 from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
 
 from agents.embedding.embedding_manager import EmbeddingManager
 from gmail_api.mail import Mail
 from utils.configuration import Config
 
 
-def cluster_mails(mail_dict: dict[str, Mail], categories: dict[int, str]) -> dict[str, list[str]]:
-    # TODO: 분류 기준 추가 시 데이터 파싱 변경
-    grouped_dict: dict[str, dict[str, Mail]] = defaultdict(dict)
-    for mail_id, mail in mail_dict.items():
-        grouped_dict[categories[mail_id]][mail_id] = mail
-
+def create_embedding_manager() -> EmbeddingManager:
     return EmbeddingManager(
         embedding_model_name=Config.config["embedding"]["model_name"],
         similarity_metric=Config.config["embedding"]["similarity_metric"],
         similarity_threshold=Config.config["embedding"]["similarity_threshold"],
         is_save_results=Config.config["embedding"]["save_results"],
-    ).run(grouped_dict)
+    )
+
+
+def cluster_mails(
+    mail_dict: dict[str, Mail],
+    categories: dict[int, str],
+    embedding_manager: Optional[EmbeddingManager] = None,
+    embedding_vectors: Optional[dict[str, np.ndarray]] = None,
+) -> dict[str, list[str]]:
+    # TODO: 분류 기준 추가 시 데이터 파싱 변경
+    grouped_dict: dict[str, dict[str, Mail]] = defaultdict(dict)
+    for mail_id, mail in mail_dict.items():
+        grouped_dict[categories[mail_id]][mail_id] = mail
+
+    if embedding_manager is None:
+        embedding_manager = create_embedding_manager()
+    return embedding_manager.run(grouped_dict, embedding_vectors)
+
+
+def collapse_similar_mails(mail_ids: Iterable[str], similar_mails_dict: dict[str, list[str]]) -> dict[str, list[str]]:
+    """
+    클러스터링 결과를 대표 메일 -> 유사 메일 ID 리스트로 묶습니다.
+    mail_ids 순서대로 아직 다른 메일에 묶이지 않은 메일을 대표로 삼고, 그 메일의 유사 메일들을 함께 묶습니다.
+    """
+    seen_mail_ids = set()
+    collapsed_dict: dict[str, list[str]] = {}
+    for mail_id in mail_ids:
+        if mail_id in seen_mail_ids:
+            continue
+
+        similar_mail_ids = similar_mails_dict.get(mail_id, [])
+        seen_mail_ids.add(mail_id)
+        seen_mail_ids.update(similar_mail_ids)
+        collapsed_dict[mail_id] = similar_mail_ids
+    return collapsed_dict
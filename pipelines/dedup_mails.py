@@ -0,0 +1,98 @@
+import re
+
+from gmail_api.mail import Mail
+from utils.configuration import Config
+from utils.token_usage_counter import TokenUsageCounter, estimate_tokens
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def dedup_mails(mail_dict: dict[str, Mail]) -> tuple[dict[str, Mail], dict[str, list[str]]]:
+    """
+    제목, 본문, 첨부파일 내용이 같은(공백 차이 무시) 메일들 중 처음 받은 메일만 남깁니다.
+    메일링 리스트나 참조로 여러 번 받은 같은 메일이 요약/분류 단계를 반복하지 않도록 fetch 직후에 사용합니다.
+    제외한 메일의 토큰 수는 TokenUsageCounter에 기록됩니다.
+
+    Returns:
+        tuple: (대표 메일만 남긴 mail_dict, 대표 메일 ID -> 중복 메일 ID 리스트)
+    """
+    if not Config.config["dedup"]["enabled"]:
+        return mail_dict, {}
+
+    representative_ids: dict[str, str] = {}
+    deduped_dict: dict[str, Mail] = {}
+    duplicates_dict: dict[str, list[str]] = {}
+    for mail_id, mail in mail_dict.items():
+        key = dedup_key(mail)
+        if key not in representative_ids:
+            representative_ids[key] = mail_id
+            deduped_dict[mail_id] = mail
+            continue
+
+        duplicates_dict.setdefault(representative_ids[key], []).append(mail_id)
+        TokenUsageCounter.add_saving("MailDeduplicator", "dedup", estimate_tokens(str(mail)))
+
+    if duplicates_dict:
+        print(
+            f"[Dedup] 중복 메일 {len(mail_dict) - len(deduped_dict)}개를 제외하고 {len(deduped_dict)}개 메일을 처리합니다."
+        )
+    return deduped_dict, duplicates_dict
+
+
+def dedup_key(mail: Mail) -> str:
+    """
+    보낸 사람, 제목, 본문, 첨부파일의 공백을 정규화하고 수신자, 날짜 등 복사본마다 다른 헤더를 비운 Mail의 content_hash
+    (Subject, From 헤더가 없는 메일은 빈 문자열로 취급)
+    """
+    normalized = mail.replace(
+        sender=_normalize(mail.sender or ""),
+        recipients=[],
+        cc=[],
+        subject=_normalize(mail.subject or ""),
+        body=_normalize(mail.body),
+        attachments=[_normalize(item) for item in mail.attachments],
+        date="",
+    )
+    return normalized.content_hash
+
+
+def fan_out(result_dict: dict, duplicates_dict: dict[str, list[str]]) -> dict:
+    """대표 메일의 결과(요약, 분류 등)를 중복 메일에도 복사합니다. 중복 메일은 대표 메일 바로 뒤에 위치합니다."""
+    fanned_out_dict = {}
+    for mail_id, result in result_dict.items():
+        fanned_out_dict[mail_id] = result
+        for duplicate_id in duplicates_dict.get(mail_id, []):
+            fanned_out_dict[duplicate_id] = result
+    return fanned_out_dict
+
+
+def merge_duplicates(
+    similar_mails_dict: dict[str, list[str]], duplicates_dict: dict[str, list[str]]
+) -> dict[str, list[str]]:
+    """
+    대표 메일로만 계산한 클러스터링 결과에 중복 메일을 합칩니다.
+    같은 그룹의 메일은 서로 유사 메일이 되고, 유사 메일 목록에 대표 메일이 있으면 그 중복 메일들도 추가됩니다.
+    """
+    groups = {}
+    for representative_id, duplicate_ids in duplicates_dict.items():
+        for mail_id in [representative_id, *duplicate_ids]:
+            groups[mail_id] = [representative_id, *duplicate_ids]
+
+    def expand(mail_ids: list[str]) -> list[str]:
+        expanded = []
+        for mail_id in mail_ids:
+            for group_mail_id in groups.get(mail_id, [mail_id]):
+                if group_mail_id not in expanded:
+                    expanded.append(group_mail_id)
+        return expanded
+
+    merged_dict = {}
+    for mail_id in fan_out(similar_mails_dict, duplicates_dict):
+        group = groups.get(mail_id, [mail_id])
+        similar_mail_ids = expand(group + similar_mails_dict.get(group[0], []))
+        merged_dict[mail_id] = [similar_mail_id for similar_mail_id in similar_mail_ids if similar_mail_id != mail_id]
+    return merged_dict
+
+
+def _normalize(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
@@ -1,16 +1,115 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import pandas as pd
 
 from agents.reflexion.reflexion import ReflexionFramework
+from agents.summary.summary_agent import SummaryAgent
+from pipelines.cluster_mails import collapse_similar_mails
+from utils.configuration import Config
+from utils.token_usage_counter import TokenUsageCounter, estimate_tokens
 
 
-def make_report(summary_dict: dict[str, str]):
+def make_report(
+    summary_dict: dict[str, str],
+    category_dict: Optional[dict[str, str]] = None,
+    similar_mails_dict: Optional[dict[str, list[str]]] = None,
+):
+    # 유사한 메일(리마인더, 전달된 메일 등)은 대표 요약문 하나와 개수로 합친다
+    if similar_mails_dict:
+        summary_dict = collapse_summaries(summary_dict, similar_mails_dict)
 
     origin_mail = "\n".join(summary_dict.values())
+
+    # 요약문이 많으면 분류 별 부분 리포트로 먼저 줄인 뒤 Reflexion에 넘긴다
+    hierarchical_config = Config.config["reflexion"]["hierarchical"]
+    reflexion_input = origin_mail
+    if hierarchical_config["enabled"] and estimate_tokens(origin_mail) > hierarchical_config["token_threshold"]:
+        reflexion_input = reduce_summaries(summary_dict, category_dict or {}, hierarchical_config)
+
     self_reflection_agent = ReflexionFramework()
-    reflexion_summary = self_reflection_agent.process(origin_mail)
+    reflexion_summary = self_reflection_agent.process(reflexion_input)
 
     pd.DataFrame({"source": [origin_mail], "report": [reflexion_summary]}).to_csv(
         "evaluation/data/generated_report.csv", index=False
     )
 
     return reflexion_summary
+
+
+def collapse_summaries(summary_dict: dict[str, str], similar_mails_dict: dict[str, list[str]]) -> dict[str, str]:
+    """클러스터마다 대표 메일의 요약문만 남기고, 묶인 메일 수를 덧붙입니다."""
+    collapsed_summary_dict = {}
+    for mail_id, similar_mail_ids in collapse_similar_mails(summary_dict, similar_mails_dict).items():
+        summary = summary_dict[mail_id]
+        if similar_mail_ids:
+            summary = f"{summary} (유사한 메일 {len(similar_mail_ids) + 1}건)"
+        collapsed_summary_dict[mail_id] = summary
+
+    saved_tokens = estimate_tokens("\n".join(summary_dict.values())) - estimate_tokens(
+        "\n".join(collapsed_summary_dict.values())
+    )
+    TokenUsageCounter.add_saving("make_report", "similar_mail_collapse", max(saved_tokens, 0))
+    return collapsed_summary_dict
+
+
+def reduce_summaries(summary_dict: dict[str, str], category_dict: dict[str, str], hierarchical_config: dict) -> str:
+    """
+    요약문을 분류(category) 별로 묶고 chunk_tokens 크기로 나누어 부분 리포트를 동시에 생성합니다.
+    부분 리포트를 합쳐도 token_threshold를 넘으면 부분 리포트를 다시 같은 방식으로 줄입니다.
+
+    Returns:
+        str: "[분류] 부분 리포트" 형식의 부분 리포트들을 줄바꿈으로 이은 문자열
+    """
+    grouped_summaries: dict[str, list[str]] = defaultdict(list)
+    for mail_id, summary in summary_dict.items():
+        grouped_summaries[category_dict.get(mail_id, "전체")].append(summary)
+
+    summary_agent = SummaryAgent(
+        model_name="solar-pro",
+        summary_type="final",
+        temperature=Config.config["temperature"]["summary"],
+        seed=Config.config["seed"],
+    )
+
+    level, item_count = 1, len(summary_dict)
+    while True:
+        chunks = [
+            (category, chunk)
+            for category, summaries in grouped_summaries.items()
+            for chunk in _chunk_by_tokens(summaries, hierarchical_config["chunk_tokens"])
+        ]
+        with ThreadPoolExecutor(max_workers=hierarchical_config["max_workers"]) as executor:
+            partial_reports = list(
+                executor.map(lambda item: summary_agent.process_partial_report("\n".join(item[1]), item[0]), chunks)
+            )
+
+        reduced = [f"[{category}] {report}" for (category, _), report in zip(chunks, partial_reports)]
+        reduced_text = "\n".join(reduced)
+        print(f"[Hierarchical Report] {level}단계: {item_count}개 -> 부분 리포트 {len(reduced)}개")
+
+        # 더 줄일 필요가 없거나, 한 묶음으로 모였거나, 개수가 줄지 않으면 종료
+        if (
+            estimate_tokens(reduced_text) <= hierarchical_config["token_threshold"]
+            or len(chunks) == 1
+            or len(reduced) >= item_count
+        ):
+            return reduced_text
+
+        grouped_summaries = {"전체": reduced}
+        level, item_count = level + 1, len(reduced)
+
+
+def _chunk_by_tokens(texts: list[str], max_tokens: int) -> list[list[str]]:
+    """텍스트 순서를 유지하며 추정 토큰 수의 합이 max_tokens 이하가 되도록 나눕니다. (한 텍스트가 더 길면 단독 묶음)"""
+    chunks: list[list[str]] = []
+    chunk_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if not chunks or chunk_tokens + tokens > max_tokens:
+            chunks.append([])
+            chunk_tokens = 0
+        chunks[-1].append(text)
+        chunk_tokens += tokens
+    return chunks
@@ -5,21 +5,36 @@ from gmail_api.gmail_service import GmailService
 from gmail_api.mail import Mail
 from pipelines.checklist_builder import build_json_checklist
 from pipelines.classify_single_mail import classify_single_mail
-from pipelines.cluster_mails import cluster_mails
+from pipelines.cluster_mails import cluster_mails, create_embedding_manager
+from pipelines.dedup_mails import dedup_mails, fan_out, merge_duplicates
 from pipelines.make_report import make_report
+from pipelines.preprocess_mails import preprocess_mails
 from pipelines.summary_single_mail import summary_single_mail
 
 
-def pipeline(gmail_service: GmailService):
+def pipeline(gmail_service: GmailService, user_id: str = "local"):
     try:
         mail_dict: dict[str, Mail] = gmail_service.fetch_mails()
+        # 내용이 같은 메일은 대표 메일 하나만 처리하고, 결과를 중복 메일에 나눠준다
+        mail_dict, duplicates_dict = dedup_mails(mail_dict)
+        mail_dict = preprocess_mails(mail_dict)
 
         summary_dict = summary_single_mail(mail_dict)
-        category_dict, action_dict = classify_single_mail(summary_dict)
 
-        similar_mails_dict = cluster_mails(mail_dict, category_dict)
+        # 메일 제목 임베딩은 kNN 분류와 클러스터링에서 함께 사용
+        embedding_manager = create_embedding_manager()
+        embedding_vectors = embedding_manager.embed(mail_dict)
 
-        report = make_report(summary_dict)
+        category_dict, action_dict = classify_single_mail(summary_dict, embedding_manager, embedding_vectors, user_id)
+
+        similar_mails_dict = cluster_mails(mail_dict, category_dict, embedding_manager, embedding_vectors)
+
+        summary_dict = fan_out(summary_dict, duplicates_dict)
+        category_dict = fan_out(category_dict, duplicates_dict)
+        action_dict = fan_out(action_dict, duplicates_dict)
+        similar_mails_dict = merge_duplicates(similar_mails_dict, duplicates_dict)
+
+        report = make_report(summary_dict, category_dict, similar_mails_dict)
 
         json_checklist = build_json_checklist(summary_dict, category_dict, action_dict, similar_mails_dict)
         print(json_checklist)
@@ -0,0 +1,150 @@
+import html
+import re
+from email.utils import getaddresses
+from typing import Optional
+
+from gmail_api.mail import Mail
+from utils.configuration import Config
+from utils.token_usage_counter import TokenUsageCounter, estimate_tokens
+
+# 이 줄부터 아래는 이전 메일을 인용한 내용으로 판단
+QUOTE_HEADER_PATTERNS = [
+    re.compile(r"^-{2,}\s*(Original Message|원본 메일|원본 메시지)\s*-{2,}\s*$", re.IGNORECASE | re.MULTILINE),
+    re.compile(r"^On .+ wrote:\s*$", re.MULTILINE),
+    re.compile(r"^.*\d{4}년 \d{1,2}월 \d{1,2}일.*님이 작성:\s*$", re.MULTILINE),
+    re.compile(r"^(From|보낸 사람)\s*:.+\n(Sent|Date|보낸 날짜)\s*:", re.MULTILINE),
+]
+# 서명 구분자 ("-- "), 본문 중간의 "--" 구분선과 구분하기 위해 마지막 MAX_SIGNATURE_LINES 줄 안에서만 인정
+SIGNATURE_PATTERN = re.compile(r"^-- $")
+MAX_SIGNATURE_LINES = 10
+# 수신 거부, 발신 전용 안내 등 모든 메일에 반복되는 footer 문구
+FOOTER_PATTERNS = re.compile(
+    r"(수신\s?거부|수신을 원하지 않|발신\s?전용|회신되지 않습니다|unsubscribe|"
+    r"this (e-?mail|message) was sent to|all rights reserved|copyright ©)",
+    re.IGNORECASE,
+)
+MAX_FOOTER_LINE_LENGTH = 200
+TRUNCATED_MARK = "...(이하 생략)"
+
+
+def preprocess_mails(mail_dict: dict[str, Mail]) -> dict[str, Mail]:
+    """
+    LLM에 전달하기 전 메일 본문에서 토큰만 차지하는 내용을 제거합니다.
+    (인용된 이전 메일, 서명, 반복되는 footer, 중복 공백, 긴 수신자 목록)
+    메일 별로 절약한 토큰 수는 TokenUsageCounter에 기록됩니다.
+    """
+    preprocess_config = Config.config["preprocess"]
+    if not preprocess_config["enabled"]:
+        return mail_dict
+
+    preprocessed_dict = {}
+    for mail_id, mail in mail_dict.items():
+        preprocessed = preprocess_mail(
+            mail, preprocess_config["max_recipients"], preprocess_config["max_tokens_per_mail"]
+        )
+        saved_tokens = estimate_tokens(str(mail)) - estimate_tokens(str(preprocessed))
+        TokenUsageCounter.add_saving("MailPreprocessor", "preprocess", max(saved_tokens, 0), mail_id=mail_id)
+        preprocessed_dict[mail_id] = preprocessed
+    return preprocessed_dict
+
+
+def preprocess_mail(mail: Mail, max_recipients: int, max_tokens: Optional[int] = None) -> Mail:
+    body = collapse_whitespace(remove_footers(strip_signature(strip_quoted_history(mail.body))))
+    attachments = [collapse_whitespace(html_to_text(attachment)) for attachment in mail.attachments]
+
+    preprocessed = mail.replace(
+        body=body,
+        attachments=attachments,
+        recipients=[compact_addresses(mail.recipients, max_recipients)],
+        cc=[compact_addresses(mail.cc, max_recipients)],
+    )
+
+    if max_tokens:
+        preprocessed = fit_token_budget(preprocessed, max_tokens)
+    return preprocessed
+
+
+def strip_quoted_history(body: str) -> str:
+    cut_index = len(body)
+    for pattern in QUOTE_HEADER_PATTERNS:
+        match = pattern.search(body)
+        if match:
+            cut_index = min(cut_index, match.start())
+
+    stripped = "\n".join(line for line in body[:cut_index].splitlines() if not line.lstrip().startswith(">"))
+    # 인용문만 있는 메일은 원문을 유지
+    return stripped if stripped.strip() else body
+
+
+def strip_signature(body: str) -> str:
+    lines = body.splitlines()
+    for idx in range(max(len(lines) - MAX_SIGNATURE_LINES, 1), len(lines)):
+        if SIGNATURE_PATTERN.match(lines[idx]):
+            return "\n".join(lines[:idx])
+    return body
+
+
+def remove_footers(body: str) -> str:
+    return "\n".join(
+        line for line in body.splitlines() if not (len(line) <= MAX_FOOTER_LINE_LENGTH and FOOTER_PATTERNS.search(line))
+    )
+
+
+def html_to_text(text: str) -> str:
+    """Document Parse의 html 출력에서 태그를 제거하고 줄바꿈, 표 구분만 남깁니다."""
+    text = re.sub(r"<br\s*/?>|</(p|h\d|li|tr|div)>", "\n", text, flags=re.IGNORECASE)
+    text = re.sub(r"</t[dh]>", " | ", text, flags=re.IGNORECASE)
+    text = re.sub(r"<[^>]+>", "", text)
+    return html.unescape(text)
+
+
+def collapse_whitespace(text: str) -> str:
+    text = re.sub(r"[ \t\u00a0]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def compact_addresses(address_fields: list[Optional[str]], max_count: int) -> str:
+    """
+    "이름 <주소>, ..." 형태의 수신자 목록을 이름(없으면 주소)만 남기고 max_count명으로 줄입니다.
+    """
+    addresses = getaddresses([field for field in address_fields if field])
+    names = [name or address for name, address in addresses if name or address]
+    if len(names) <= max_count:
+        return ", ".join(names)
+    return f"{', '.join(names[:max_count])} 외 {len(names) - max_count}명"
+
+
+def fit_token_budget(mail: Mail, max_tokens: int) -> Mail:
+    """
+    메일 전체가 max_tokens를 넘으면 본문에 먼저 예산을 배분하고, 남은 예산을 첨부파일에 나누어 잘라냅니다.
+    """
+    if estimate_tokens(str(mail)) <= max_tokens:
+        return mail
+
+    header_tokens = estimate_tokens(str(mail.replace(body="", attachments=())))
+    # "첨부파일 N:" 머리말처럼 첨부파일마다 추가되는 토큰도 미리 제외
+    attachment_overhead = estimate_tokens("첨부파일 00:\n\n\n") * len(mail.attachments)
+    remaining = max(max_tokens - header_tokens - attachment_overhead, 0)
+
+    body = truncate_to_tokens(mail.body, remaining)
+    remaining -= estimate_tokens(body)
+
+    attachments = []
+    for idx, attachment in enumerate(mail.attachments):
+        # 남은 예산을 남은 첨부파일 수만큼 나누어 배분
+        share = remaining // (len(mail.attachments) - idx)
+        truncated = truncate_to_tokens(attachment, share)
+        remaining -= estimate_tokens(truncated)
+        attachments.append(truncated)
+
+    return mail.replace(body=body, attachments=attachments)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # estimate_tokens 기준(4 bytes = 1 토큰)으로 bytes 길이를 맞춘 뒤 깨진 글자는 버린다
+    max_bytes = max(max_tokens * 4 - len(TRUNCATED_MARK.encode("utf-8")), 0)
+    return text.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore") + TRUNCATED_MARK
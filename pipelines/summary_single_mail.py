@@ -1,7 +1,11 @@
+import asyncio
+
 import pandas as pd
 
 from agents.self_refine.self_refine_agent import SelfRefineAgent
 from agents.summary.summary_agent import SummaryAgent
+from agents.utils.client_registry import UpstageClientRegistry
+from agents.utils.groundness_check import GroundednessService
 from gmail_api.mail import Mail
 from utils.configuration import Config
 
@@ -9,17 +13,43 @@ from utils.configuration import Config
 def summary_single_mail(mail_dict: dict[str, Mail]) -> dict[str, str]:
     temperature: int = Config.config["temperature"]["summary"]
     seed: int = Config.config["seed"]
+    max_concurrency: int = Config.config["single_summary"]["max_concurrency"]
 
     summary_agent = SummaryAgent("solar-pro", "single", temperature, seed)
     self_refine_agent = SelfRefineAgent("solar-pro", temperature, seed)
 
-    summary_dict = {
-        mail_id: self_refine_agent.process(mail, summary_agent.process(str(mail)))
-        for mail_id, mail in mail_dict.items()
-    }
+    # SummaryAgent와 SelfRefineAgent가 이번 실행 동안 Groundness Check 결과를 공유
+    GroundednessService.reset()
+    summary_dict = asyncio.run(_summarize_mails(mail_dict, summary_agent, self_refine_agent, max_concurrency))
 
     pd.DataFrame.from_dict(summary_dict, orient="index", columns=["summary"]).to_csv(
         "evaluation/data/generated_summary.csv", index_label="id"
     )
 
     return summary_dict
+
+
+async def _summarize_mails(
+    mail_dict: dict[str, Mail],
+    summary_agent: SummaryAgent,
+    self_refine_agent: SelfRefineAgent,
+    max_concurrency: int,
+) -> dict[str, str]:
+    """
+    메일들을 최대 max_concurrency개씩 동시에 요약합니다.
+    메일 하나 안에서의 요약 -> Self-refine 반복 순서는 그대로 유지하며, 결과는 mail_dict 순서를 따릅니다.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def summarize(mail: Mail) -> str:
+        async with semaphore:
+            summary = await summary_agent.aprocess(mail)
+            return await self_refine_agent.aprocess(mail, summary)
+
+    try:
+        summaries = await asyncio.gather(*(summarize(mail) for mail in mail_dict.values()))
+    finally:
+        # 이벤트 루프가 닫히기 전에 이 루프의 연결 풀을 정리
+        await UpstageClientRegistry.aclose_loop_clients()
+
+    return dict(zip(mail_dict.keys(), summaries))
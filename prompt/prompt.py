@@ -1,4 +1,4 @@
-import os
+from prompt.prompt_registry import PromptRegistry
 
 
 def load_template(template_type: str, file_name: str) -> str:
@@ -19,14 +19,8 @@ def load_template(template_type: str, file_name: str) -> str:
         str:
             템플릿 파일의 내용을 문자열로 반환.
     """
-    base_dir = os.path.dirname(__file__)
-    file_path = os.path.join(base_dir, "template", template_type, file_name)
-
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Template file '{file_name}' not found.")
-
-    with open(file_path, "r", encoding="utf-8") as file:
-        return file.read().strip()
+    # 시작 시 PromptRegistry에 읽어둔 템플릿을 사용
+    return PromptRegistry.get(template_type, file_name)
 
 
 def load_template_with_variables(template_type: str, file_name: str, **kwargs):
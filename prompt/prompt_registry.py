@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+
+import yaml
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "template")
+TEMPLATE_EXTENSIONS = (".txt", ".yaml")
+
+
+class PromptRegistry:
+    """
+    prompt/template 아래의 모든 템플릿(txt)과 분류 기준(yaml)을 한 번만 읽어 메모리에 보관합니다.
+    에이전트는 매 호출마다 파일을 여는 대신 이 레지스트리에서 템플릿을 가져옵니다.
+
+    - 키는 template 디렉토리 기준 상대 경로입니다. (예: "self_refine/feedback_system.txt")
+    - 모든 템플릿의 해시로 만든 버전(version)은 LLMResponseCache 키에 포함되어, 템플릿을 수정하면 이전 응답을 사용하지 않습니다.
+    - 템플릿 파일을 수정한 뒤에는 reload()로 다시 읽어야 반영됩니다.
+    """
+
+    version: str = ""
+    _templates: dict[str, str] = {}
+    _hashes: dict[str, str] = {}
+    _yamls: dict[str, list] = {}
+    _categories_text: dict[str, str] = {}
+    _loaded: bool = False
+    _lock = threading.RLock()
+
+    @classmethod
+    def load(cls) -> None:
+        """모든 템플릿을 읽어옵니다. 이미 읽었다면 아무것도 하지 않습니다."""
+        with cls._lock:
+            if not cls._loaded:
+                cls.reload()
+
+    @classmethod
+    def reload(cls) -> None:
+        """템플릿 파일을 모두 다시 읽고, 분류 기준 텍스트와 해시를 다시 계산합니다."""
+        templates, hashes, yamls = {}, {}, {}
+        for root, _, file_names in os.walk(TEMPLATE_DIR):
+            for file_name in sorted(file_names):
+                if not file_name.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                file_path = os.path.join(root, file_name)
+                key = os.path.relpath(file_path, TEMPLATE_DIR).replace(os.sep, "/")
+                with open(file_path, "r", encoding="utf-8") as file:
+                    templates[key] = file.read()
+                hashes[key] = hashlib.sha256(templates[key].encode("utf-8")).hexdigest()
+                if file_name.endswith(".yaml"):
+                    try:
+                        yamls[key] = yaml.safe_load(templates[key])
+                    except yaml.YAMLError as e:
+                        raise ValueError(f"YAML 파일 파싱 중 오류 발생: {e}")
+
+        version_hasher = hashlib.sha256()
+        for key in sorted(hashes):
+            version_hasher.update(f"{key}:{hashes[key]}\n".encode("utf-8"))
+
+        with cls._lock:
+            cls._templates, cls._hashes, cls._yamls = templates, hashes, yamls
+            cls._categories_text = {}
+            cls.version = version_hasher.hexdigest()[:12]
+            cls._loaded = True
+
+    @classmethod
+    def get_raw(cls, key: str) -> str:
+        """템플릿 원문을 그대로 반환합니다."""
+        cls.load()
+        if key not in cls._templates:
+            raise FileNotFoundError(f"Template file '{key}' not found.")
+        return cls._templates[key]
+
+    @classmethod
+    def get(cls, template_type: str, file_name: str) -> str:
+        """앞뒤 공백을 제거한 템플릿을 반환합니다. (prompt.load_template과 같은 결과)"""
+        return cls.get_raw(f"{template_type}/{file_name}").strip()
+
+    @classmethod
+    def get_by_path(cls, file_path: str) -> str:
+        """
+        "prompt/template/..." 형태의 파일 경로(config의 prompt_path 등)로 템플릿 원문을 반환합니다.
+        template 디렉토리 밖의 파일은 지원하지 않습니다.
+        """
+        key = os.path.relpath(os.path.abspath(file_path), TEMPLATE_DIR).replace(os.sep, "/")
+        if key.startswith(".."):
+            raise FileNotFoundError(f"Template file '{file_path}' is not under {TEMPLATE_DIR}.")
+        return cls.get_raw(key)
+
+    @classmethod
+    def get_version(cls) -> str:
+        cls.load()
+        return cls.version
+
+    @classmethod
+    def get_categories(cls, classification_type: str, is_prompt: bool = False) -> list[dict[str, str]]:
+        """
+        classification/{classification_type}.yaml의 카테고리 정보를 반환합니다.
+        is_prompt가 True이면 name과 rubric을, False이면 name과 description을 반환합니다.
+        """
+        cls.load()
+        key = f"classification/{classification_type}.yaml"
+        if key not in cls._yamls:
+            raise FileNotFoundError(f"카테고리 파일 prompt/template/{key}이(가) 존재하지 않습니다.")
+
+        field = "rubric" if is_prompt else "description"
+        return [{"name": category["name"], field: category[field]} for category in cls._yamls[key]]
+
+    @classmethod
+    def get_categories_text(cls, classification_type: str) -> str:
+        """분류 프롬프트에 들어갈 카테고리 명/분류 기준 텍스트를 한 번만 만들어 반환합니다."""
+        with cls._lock:
+            if classification_type not in cls._categories_text:
+                cls._categories_text[classification_type] = "".join(
+                    f"카테고리 명: {category['name']}\n분류 기준: {category['rubric']}\n"
+                    for category in cls.get_categories(classification_type, is_prompt=True)
+                )
+            return cls._categories_text[classification_type]
@@ -5,6 +5,7 @@ CREATE TABLE user_tb
     access_token    VARCHAR(255)  NOT NULL,
     refresh_token   VARCHAR(255)  NOT NULL,
     expiry          TIMESTAMP     NOT NULL,
+    history_id      VARCHAR(20),
     upstage_api_key VARCHAR(50),
     created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -0,0 +1,3 @@
+-- 증분 동기화(gmail.sync_mode: incremental)의 기준점을 저장하는 칼럼
+-- initdb.d/ddl.sql은 새로 초기화하는 DB에만 적용되므로, 기존 DB에는 이 파일을 한 번 실행해야 합니다.
+ALTER TABLE user_tb ADD COLUMN history_id VARCHAR(20) NULL AFTER expiry;
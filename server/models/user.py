@@ -10,5 +10,6 @@ class User(BaseModel):
     access_token: str
     refresh_token: str
     expiry: datetime
+    history_id: Optional[str] = None
     upstage_api_key: Optional[str] = None
     created_at: Optional[datetime] = None
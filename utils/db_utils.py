@@ -120,6 +120,23 @@ def authenticate_gmail(user: dict):
     return build("gmail", "v1", credentials=creds)
 
 
+def has_history_id_column() -> bool:
+    """user_tb에 history_id 칼럼이 있는지 확인합니다. (server/.db/migrations/001_add_user_history_id.sql 적용 여부)"""
+    with db_cursor() as cursor:
+        query = (
+            "SELECT COUNT(*) AS count FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'user_tb' AND COLUMN_NAME = 'history_id'"
+        )
+        cursor.execute(query, (DB_NAME,))
+        return cursor.fetchone()["count"] > 0
+
+
+def update_history_id(user_id: int, history_id: str):
+    with db_cursor() as cursor:
+        query = "UPDATE user_tb SET history_id = %s WHERE id = %s"
+        cursor.execute(query, (history_id, user_id))
+
+
 def insert_report(user_id, report, json_checklist):
     current_datetime = datetime.now()
 
@@ -1,3 +1,4 @@
+import asyncio
 import time
 from functools import wraps
 from typing import Callable
@@ -28,3 +29,29 @@ def retry_with_exponential_backoff(max_retry: int = 9, base_wait: int = 1):
         return wrapper
 
     return decorator
+
+
+def async_retry_with_exponential_backoff(max_retry: int = 9, base_wait: int = 1):
+    """
+    지수 백오프 방식으로 재시도하는 코루틴용 데코레이터
+    대기 중에도 이벤트 루프를 막지 않도록 asyncio.sleep을 사용합니다.
+    """
+
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            wait_time = base_wait
+            for attempt in range(max_retry):
+                try:
+                    return await func(*args, **kwargs)
+                except openai.RateLimitError as e:
+                    print(f"[RateLimitError] 재시도 {attempt+1}/{max_retry}회: {e}")
+                    if attempt < max_retry - 1:
+                        await asyncio.sleep(wait_time)
+                        wait_time *= 2
+                    else:
+                        raise e  # 최대 재시도 횟수 초과 시 에러 발생
+
+        return wrapper
+
+    return decorator
@@ -1,11 +1,23 @@
+import math
 from collections import defaultdict
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 텍스트의 토큰 수를 대략적으로 추정합니다.
+    (UTF-8 기준 4 bytes 당 1 토큰, 한글 1글자는 약 0.75 토큰)
+    """
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
 class TokenUsageCounter:
     token_usage_records = []
+    token_saving_records = []
+    cache_lookup_records = defaultdict(lambda: {"hits": 0, "misses": 0})
 
     @classmethod
     def add_usage(cls, agent_name: str, usage_type: str, tokens: int):
@@ -14,6 +26,22 @@ class TokenUsageCounter:
         """
         cls.token_usage_records.append({"agent_name": agent_name, "usage_type": usage_type, "tokens": tokens})
 
+    @classmethod
+    def add_saving(cls, agent_name: str, saving_type: str, tokens: int, mail_id: Optional[str] = None):
+        """
+        전처리, 캐시 등으로 절약한 토큰 수를 기록합니다. 메일 단위로 절약한 경우 mail_id를 함께 기록합니다.
+        """
+        cls.token_saving_records.append(
+            {"agent_name": agent_name, "saving_type": saving_type, "tokens": tokens, "mail_id": mail_id}
+        )
+
+    @classmethod
+    def add_cache_lookup(cls, cache_name: str, usage_type: str, hit: bool):
+        """
+        캐시 이름, 액션(혹은 작업) 종류 별로 캐시 적중/미적중 횟수를 기록합니다.
+        """
+        cls.cache_lookup_records[(cache_name, usage_type)]["hits" if hit else "misses"] += 1
+
     @staticmethod
     def plot_token_cost():
         """
@@ -71,6 +99,34 @@ class TokenUsageCounter:
         plt.tight_layout()
         plt.savefig("token-usage.png")
 
+        TokenUsageCounter.print_token_saving()
+
+    @staticmethod
+    def print_token_saving():
+        """
+        기록된 토큰 절약량(token_saving_records)을 saving_type 별로 합산하여 출력합니다.
+        """
+        saving_dict = defaultdict(int)
+        mail_saving_dict = defaultdict(dict)
+        for record in TokenUsageCounter.token_saving_records:
+            saving_dict[(record["agent_name"], record["saving_type"])] += record["tokens"]
+            if record["mail_id"] is not None:
+                mail_saving_dict[(record["agent_name"], record["saving_type"])][record["mail_id"]] = record["tokens"]
+
+        if saving_dict:
+            print(f"{'=' * 20}TOKEN SAVING{'=' * 20}\n")
+            for (agent_name, saving_type), tokens in sorted(saving_dict.items()):
+                print(f"Agent: {agent_name}\nSaving Type: {saving_type}\nToken Saving :{tokens}")
+                for mail_id, mail_tokens in mail_saving_dict[(agent_name, saving_type)].items():
+                    print(f"  - {mail_id}: {mail_tokens}")
+                print()
+
+        if TokenUsageCounter.cache_lookup_records:
+            print(f"{'=' * 20}CACHE{'=' * 20}\n")
+            for (cache_name, usage_type), record in sorted(TokenUsageCounter.cache_lookup_records.items()):
+                print(f"Cache: {cache_name}\nUsage Type: {usage_type}")
+                print(f"Hits: {record['hits']}, Misses: {record['misses']}\n")
+
     @staticmethod
     def get_total_token_cost():
         return sum(record["tokens"] for record in TokenUsageCounter.token_usage_records)